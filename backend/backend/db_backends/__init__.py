@@ -0,0 +1,25 @@
+class HealthCheckMixin:
+    """Проверка постоянного соединения перед первым запросом к базе.
+
+    В Django 2.2 нет CONN_HEALTH_CHECKS: соединение, которое сервер закрыл
+    за время простоя, всплывает ошибкой у пользователя. Здесь соединение
+    проверяется один раз за HTTP-запрос и при необходимости открывается
+    заново.
+    """
+    health_check_done = False
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if (
+            self.connection is not None
+            and not self.health_check_done
+            and self.settings_dict.get("CONN_HEALTH_CHECKS")
+            and not self.in_atomic_block
+        ):
+            self.health_check_done = True
+            if not self.is_usable():
+                self.close()
+        super().ensure_connection()
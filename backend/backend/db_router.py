@@ -0,0 +1,63 @@
+import contextvars
+import hashlib
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Читать с реплики разрешает только ReplicaRoutingMiddleware для безопасных
+# запросов. Команды, миграции и фоновые задачи всегда работают с основной
+# базой и не видят отставания реплик.
+replica_reads = contextvars.ContextVar("replica_reads", default=False)
+
+# Токен, выданный только что, должен находиться сразу, а клиент без
+# токена ещё не прилип к основной базе, поэтому аутентификация читает
+# только из неё
+PRIMARY_ONLY_APPS = ("authtoken", "sessions")
+
+
+class PrimaryReplicaRouter:
+    """Запись в default, чтение с одной из реплик, когда это разрешено"""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return "default"
+        if settings.REPLICA_DATABASES and replica_reads.get():
+            return random.choice(settings.REPLICA_DATABASES)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {"default", *settings.REPLICA_DATABASES}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему вместе с данными от основной базы
+        return db not in settings.REPLICA_DATABASES
+
+
+def pin_key(request):
+    """Ключ клиента для прилипания к основной базе после записи"""
+    credentials = (
+        request.META.get("HTTP_AUTHORIZATION")
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not credentials:
+        return None
+    digest = hashlib.sha1(credentials.encode()).hexdigest()
+    return f"primary-pin:{digest}"
+
+
+def pin_to_primary(request):
+    key = pin_key(request)
+    if key is not None:
+        cache.set(key, True, settings.READ_YOUR_WRITES_SECONDS)
+
+
+def is_pinned(request):
+    key = pin_key(request)
+    return key is not None and cache.get(key, False)
@@ -0,0 +1,213 @@
+import fcntl
+import glob
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import permissions
+from rest_framework.views import APIView
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+NUMBERS = re.compile(r"\b\d+\b")
+# Значения завершённых воркеров, сложенные в один файл
+RETIRED_FILE = "retired.json"
+LOCK_FILE = "metrics.lock"
+
+
+def sql_shape(sql):
+    """Запрос без значений, чтобы одинаковые запросы совпадали"""
+    return NUMBERS.sub("?", IN_LIST.sub("IN (...)", sql))
+
+
+def empty_stats():
+    return {
+        "buckets": [0] * len(BUCKETS),
+        "count": 0,
+        "sum": 0.0,
+        "db_seconds": 0.0,
+        "queries": 0,
+    }
+
+
+class RouteHistograms:
+    """Гистограммы длительности по маршрутам.
+
+    Каждый процесс копит свои значения в памяти. С METRICS_DIR процесс
+    не чаще раза в METRICS_FLUSH_SECONDS сбрасывает их в свой файл, а
+    /api/metrics/ суммирует файлы работающих воркеров и общий файл
+    завершённых: счётчики не должны уменьшаться при перезапуске воркера.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = defaultdict(empty_stats)
+        self.flushed = 0.0
+        self.path_pid = None
+        self.path = None
+
+    def observe(self, route, method, status, duration, db_seconds, queries):
+        with self.lock:
+            stats = self.routes[(route, method, status)]
+            for position, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    stats["buckets"][position] += 1
+            stats["count"] += 1
+            stats["sum"] += duration
+            stats["db_seconds"] += db_seconds
+            stats["queries"] += queries
+            due = time.monotonic() - self.flushed >= (
+                settings.METRICS_FLUSH_SECONDS)
+        if due:
+            self.dump()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                key: dict(value, buckets=list(value["buckets"]))
+                for key, value in self.routes.items()
+            }
+
+    def own_path(self):
+        # pid может достаться новому воркеру, его файл не должен
+        # затереть значения завершённого
+        pid = os.getpid()
+        if self.path_pid != pid:
+            self.path_pid = pid
+            self.path = os.path.join(
+                settings.METRICS_DIR, f"{pid}-{uuid.uuid4().hex}.json")
+        return self.path
+
+    def dump(self):
+        if not settings.METRICS_DIR:
+            return
+        self.flushed = time.monotonic()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        write_routes(self.own_path(), self.snapshot())
+
+    def retire(self):
+        """Переносит значения завершающегося воркера в общий файл.
+
+        Без этого каждый перезапуск по max_requests оставлял бы свой
+        файл, и каждый сбор метрик читал бы их все.
+        """
+        if not settings.METRICS_DIR:
+            return
+        retired = os.path.join(settings.METRICS_DIR, RETIRED_FILE)
+        with metrics_lock(fcntl.LOCK_EX):
+            routes = read_routes(retired)
+            merge_routes(routes, self.snapshot())
+            write_routes(retired, routes)
+            try:
+                os.remove(self.own_path())
+            except FileNotFoundError:
+                pass
+
+    def collect(self):
+        """Значения всех процессов, свои берутся из памяти"""
+        routes = self.snapshot()
+        if not settings.METRICS_DIR:
+            return routes
+        own = self.own_path()
+        # Под общей блокировкой файл воркера и его доля в общем файле
+        # не попадут в сумму дважды
+        with metrics_lock(fcntl.LOCK_SH):
+            paths = glob.glob(os.path.join(settings.METRICS_DIR, "*.json"))
+            for path in paths:
+                if path != own:
+                    merge_routes(routes, read_routes(path))
+        return routes
+
+    def render(self):
+        routes = self.collect()
+        lines = [
+            "# HELP foodgram_request_duration_seconds Время ответа",
+            "# TYPE foodgram_request_duration_seconds histogram",
+        ]
+        for (route, method, status), stats in sorted(routes.items()):
+            labels = f'route="{route}",method="{method}",status="{status}"'
+            for bound, value in zip(BUCKETS, stats["buckets"]):
+                lines.append(
+                    "foodgram_request_duration_seconds_bucket"
+                    f'{{{labels},le="{bound}"}} {value}')
+            lines += [
+                "foodgram_request_duration_seconds_bucket"
+                f'{{{labels},le="+Inf"}} {stats["count"]}',
+                f"foodgram_request_duration_seconds_sum{{{labels}}} "
+                f"{stats['sum']:.6f}",
+                f"foodgram_request_duration_seconds_count{{{labels}}} "
+                f"{stats['count']}",
+            ]
+        for name, key, kind, help_text in (
+            ("foodgram_db_queries_total", "queries", "counter",
+             "Число SQL-запросов"),
+            ("foodgram_db_seconds_total", "db_seconds", "counter",
+             "Время в базе данных"),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for (route, method, status), stats in sorted(routes.items()):
+                lines.append(
+                    f'{name}{{route="{route}",method="{method}",'
+                    f'status="{status}"}} {stats[key]}')
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def metrics_lock(operation):
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    with open(os.path.join(settings.METRICS_DIR, LOCK_FILE), "a") as file:
+        fcntl.flock(file, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def read_routes(path):
+    try:
+        with open(path, encoding="utf-8") as file:
+            rows = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return {(route, method, status): stats
+            for route, method, status, stats in rows}
+
+
+def write_routes(path, routes):
+    # Запись через временный файл: читатель не увидит половину JSON
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump([[*key, stats] for key, stats in routes.items()], file)
+    os.replace(temporary, path)
+
+
+def merge_routes(routes, other):
+    for key, stats in other.items():
+        total = routes.setdefault(key, empty_stats())
+        total["buckets"] = [
+            mine + theirs
+            for mine, theirs in zip(total["buckets"], stats["buckets"])
+        ]
+        for name in ("count", "sum", "db_seconds", "queries"):
+            total[name] += stats[name]
+
+
+histograms = RouteHistograms()
+
+
+class MetricsView(APIView):
+    """Метрики в текстовом формате Prometheus, только для персонала"""
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        return HttpResponse(
+            histograms.render(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
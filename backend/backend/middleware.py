@@ -0,0 +1,221 @@
+import contextvars
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+from .db_router import is_pinned, pin_to_primary, replica_reads
+from .metrics import histograms, sql_shape
+
+logger = logging.getLogger("foodgram.performance")
+
+current_timer = contextvars.ContextVar("current_timer", default=None)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class RequestTimer:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializer_db_seconds = 0.0
+        self.serializer_depth = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_seconds += elapsed
+            if self.serializer_depth:
+                self.serializer_db_seconds += elapsed
+            self.shapes[sql] += 1
+
+
+def timed_serializer(serializer):
+    """Учитывает to_representation этого сериализатора в Server-Timing.
+
+    Подменяется метод экземпляра, классы DRF остаются нетронутыми.
+    """
+    represent = serializer.to_representation
+
+    def to_representation(instance):
+        timer = current_timer.get()
+        if timer is None or timer.serializer_depth:
+            return represent(instance)
+        timer.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return represent(instance)
+        finally:
+            timer.serializer_seconds += time.perf_counter() - started
+            timer.serializer_depth -= 1
+
+    serializer.to_representation = to_representation
+    return serializer
+
+
+class TimedSerializerMixin:
+    """Время сериализаторов из get_serializer попадает в ser"""
+
+    def get_serializer(self, *args, **kwargs):
+        return timed_serializer(super().get_serializer(*args, **kwargs))
+
+
+class TimingMiddleware:
+    """Число запросов к базе, время базы, сериализации и всего ответа.
+
+    Отдаёт их в заголовке Server-Timing, пишет медленные запросы в лог
+    и копит гистограммы по маршрутам для /api/metrics/.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_seconds = settings.SLOW_REQUEST_MS / 1000
+
+    @staticmethod
+    def counting(timer):
+        stack = ExitStack()
+        # Считаем запросы и к основной базе, и к репликам
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(timer))
+        return stack
+
+    def __call__(self, request):
+        timer = RequestTimer()
+        token = current_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            with self.counting(timer):
+                response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        total = time.perf_counter() - started
+        serializer = timer.serializer_seconds - timer.serializer_db_seconds
+        # Заголовки уходят до тела, у потокового ответа в них только
+        # подготовка, а метрики учитывают и отдачу
+        response["Server-Timing"] = ", ".join((
+            f'db;dur={timer.db_seconds * 1000:.2f};'
+            f'desc="{timer.queries} queries"',
+            f"ser;dur={serializer * 1000:.2f}",
+            f"total;dur={total * 1000:.2f}",
+        ))
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content, request, response, timer,
+                started)
+        else:
+            self.finish(request, response, timer, total)
+        return response
+
+    def stream(self, content, request, response, timer, started):
+        try:
+            with self.counting(timer):
+                yield from content
+        finally:
+            self.finish(request, response, timer,
+                        time.perf_counter() - started)
+
+    def finish(self, request, response, timer, total):
+        match = request.resolver_match
+        route = match.view_name if match else "unmatched"
+        histograms.observe(route, request.method, response.status_code,
+                           total, timer.db_seconds, timer.queries)
+        if total >= self.slow_seconds:
+            repeated = [
+                f"{count}x {sql_shape(sql)}"
+                for sql, count in timer.shapes.most_common(5) if count > 1
+            ]
+            logger.warning(
+                "Медленный запрос %s %s: %.0f мс, SQL %d за %.0f мс%s",
+                request.method, request.get_full_path(), total * 1000,
+                timer.queries, timer.db_seconds * 1000,
+                "".join(f"\n  {line}" for line in repeated),
+            )
+
+
+class ReplicaRoutingMiddleware:
+    """Безопасные запросы читают с реплик, остальные идут в основную базу.
+
+    После записи клиент на READ_YOUR_WRITES_SECONDS прилипает к основной
+    базе, чтобы сразу видеть свои изменения, даже если реплика отстаёт.
+    """
+
+    def __init__(self, get_response):
+        # Отметка о записи должна быть видна воркеру, который примет
+        # следующий запрос клиента
+        if settings.REPLICA_DATABASES and not settings.SHARED_CACHE:
+            raise ImproperlyConfigured(
+                "DB_REPLICAS требует общего кеша: задайте CACHE_BACKEND, "
+                "например FileBasedCache"
+            )
+        self.get_response = get_response
+
+    def __call__(self, request):
+        safe = request.method in SAFE_METHODS
+        token = replica_reads.set(safe and not is_pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        if not safe:
+            pin_to_primary(request)
+        return response
+
+
+class StatementTimeout:
+    """Выставляет statement_timeout перед первым SQL запроса"""
+
+    def __init__(self, request):
+        self.request = request
+        self.applied = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        timeout = getattr(self.request, "statement_timeout", None)
+        alias = context["connection"].alias
+        if timeout is not None and alias not in self.applied:
+            self.applied.add(alias)
+            # Сырой курсор, чтобы SET не попадал в счётчики запросов
+            context["cursor"].cursor.execute(
+                "SET statement_timeout = %s", [timeout])
+        return execute(sql, params, many, context)
+
+
+class StatementTimeoutMiddleware:
+    """Ограничивает время SQL в PostgreSQL по классу маршрута.
+
+    Долгие выгрузки получают больший лимит, обычное чтение — меньший,
+    см. STATEMENT_TIMEOUTS. На SQLite ничего не делает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.aliases = [
+            alias for alias in connections
+            if connections[alias].vendor == "postgresql"
+        ]
+
+    def __call__(self, request):
+        if not self.aliases:
+            return self.get_response(request)
+        timeout = StatementTimeout(request)
+        with ExitStack() as stack:
+            for alias in self.aliases:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(timeout))
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        route_class = getattr(view_func, "initkwargs", {}).get(
+            "statement_timeout")
+        if route_class is None:
+            route_class = "read" if request.method in SAFE_METHODS else "write"
+        request.statement_timeout = settings.STATEMENT_TIMEOUTS.get(
+            route_class)
@@ -47,12 +47,15 @@ INSTALLED_APPS = [
     "drf_yasg",
     "djoser",
     "django_filters",
-    "recipes",
-    "user",
+    "recipes.apps.RecipesConfig",
+    "user.apps.UserConfig",
     "colorfield"
 ]
 
 MIDDLEWARE = [
+    "backend.middleware.TimingMiddleware",
+    "backend.middleware.ReplicaRoutingMiddleware",
+    "backend.middleware.StatementTimeoutMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -86,26 +89,93 @@ WSGI_APPLICATION = "backend.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+DB_ENGINE = os.getenv("DB_ENGINE", "django.db.backends.sqlite3")
+# Сколько секунд держать соединение между запросами, 0 — закрывать сразу
+CONN_MAX_AGE = int(os.getenv("CONN_MAX_AGE", 60))
+# Перед первым запросом к базе проверять, что постоянное соединение живо
+CONN_HEALTH_CHECKS = os.getenv("CONN_HEALTH_CHECKS", "1") == "1"
+
+if DB_ENGINE.endswith("postgresql"):
+    DATABASES = {
+        "default": {
+            "ENGINE": "backend.db_backends.postgresql",
+            "NAME": os.getenv("DB_NAME", "postgres"),
+            "USER": os.getenv("DB_USER", os.getenv("POSTGRES_USER")),
+            "PASSWORD": os.getenv(
+                "DB_PASSWORD", os.getenv("POSTGRES_PASSWORD")),
+            "HOST": os.getenv("DB_HOST", "db"),
+            "PORT": os.getenv("DB_PORT", "5432"),
+            "CONN_MAX_AGE": CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": CONN_HEALTH_CHECKS,
+            "OPTIONS": {
+                "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", 5)),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "backend.db_backends.sqlite3",
+            "NAME": os.getenv(
+                "DB_NAME", os.path.join(BASE_DIR, "db.sqlite3")),
+            "CONN_MAX_AGE": CONN_MAX_AGE,
+            "OPTIONS": {
+                # WAL пускает читателей параллельно с писателем, NORMAL
+                # в режиме WAL не теряет целостность при сбое процесса
+                "pragmas": {
+                    "journal_mode": "WAL",
+                    "synchronous": "NORMAL",
+                    "mmap_size": int(
+                        os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+                    "busy_timeout": int(
+                        os.getenv("SQLITE_BUSY_TIMEOUT", 5000)),
+                },
+            },
+        }
     }
+
+# Реплики только для чтения через запятую: хосты PostgreSQL или пути
+# к файлам SQLite, например DB_REPLICAS=/data/replica1.sqlite3
+REPLICA_DATABASES = []
+for number, replica in enumerate(
+        filter(None, os.getenv("DB_REPLICAS", "").split(",")), 1):
+    alias = f"replica{number}"
+    location = "HOST" if DB_ENGINE.endswith("postgresql") else "NAME"
+    DATABASES[alias] = dict(
+        DATABASES["default"],
+        **{location: replica.strip()},
+        TEST={"MIRROR": "default"},
+    )
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ["backend.db_router.PrimaryReplicaRouter"]
+
+# Сколько секунд после записи клиент читает только из основной базы
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", 5))
+
+# statement_timeout PostgreSQL в миллисекундах по классам маршрутов.
+# Класс маршрута задаёт аргумент statement_timeout у @action, остальные
+# запросы делятся на чтение и запись по HTTP-методу
+STATEMENT_TIMEOUTS = {
+    "read": int(os.getenv("STATEMENT_TIMEOUT_READ", 5000)),
+    "write": int(os.getenv("STATEMENT_TIMEOUT_WRITE", 15000)),
+    "export": int(os.getenv("STATEMENT_TIMEOUT_EXPORT", 60000)),
 }
 
-# Заготовка под постгресс
-# DATABASES = {
-#     'default': {
-#         'ENGINE':
-#           os.getenv('DB_ENGINE', default='django.db.backends.postgresql'),
-#         'NAME':
-#           os.getenv('DB_NAME', default='postgres'),
-#         'USER': os.getenv('DB_USER', default='postgres'),
-#         'PASSWORD': os.getenv('DB_PASSWORD', default='Spyderco8Cr13Mov'),
-#         'HOST': os.getenv('DB_HOST', default='db'),
-#         'PORT': os.getenv('DB_PORT', default='5432')
-#     }
-# }
+# Общий кеш ответов. LocMemCache живёт в памяти одного процесса, поэтому
+# при нескольких воркерах нужен общий бэкенд, например FileBasedCache
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", "foodgram"),
+    }
+}
+# Версии кеша, прилипание к основной базе и сброс токенов видны другим
+# процессам только через общий бэкенд
+SHARED_CACHE = not CACHES["default"]["BACKEND"].endswith(
+    ("LocMemCache", "DummyCache"))
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -146,6 +216,32 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/backend_media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'backend_media/')
 
+# Запросы дольше этого порога пишутся в лог с повторяющимися SQL
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", 500))
+
+# Каталог, через который воркеры gunicorn складывают метрики в общий
+# /api/metrics/. Без него каждый процесс отдаёт только свои значения
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", 1))
+
+# Ограничения на фото рецепта, проверяются до декодирования пикселей
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.getenv("RECIPE_IMAGE_MAX_SIZE", 10 * 1024 * 1024))
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.getenv("RECIPE_IMAGE_MAX_PIXELS", 40_000_000))
+
+# Кеш токенов: записей в памяти процесса, срок жизни в процессе
+# и в общем кеше, секунды
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+AUTH_TOKEN_LOCAL_TTL = int(os.getenv("AUTH_TOKEN_LOCAL_TTL", 10))
+AUTH_TOKEN_SHARED_TTL = int(os.getenv("AUTH_TOKEN_SHARED_TTL", 300))
+
+# Рецепты авторов, у которых подписчиков больше порога, не раскладываются
+# по лентам, а читаются при запросе ленты
+FEED_FANOUT_LIMIT = int(os.getenv("FEED_FANOUT_LIMIT", 5000))
+# Сколько последних рецептов автора попадает в ленту при подписке
+FEED_BACKFILL = int(os.getenv("FEED_BACKFILL", 50))
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 AUTH_USER_MODEL = "user.User"
 
@@ -168,7 +264,7 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "user.authentication.CachedTokenAuthentication",
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     "PAGE_SIZE": 6,
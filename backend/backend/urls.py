@@ -5,6 +5,8 @@ from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from django.conf.urls import url
 
+from .metrics import MetricsView
+
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -12,6 +14,7 @@ urlpatterns = [
         "api/",
         include(
             [
+                path("metrics/", MetricsView.as_view(), name="metrics"),
                 path("", include("user.urls", namespace="users")),
                 path("", include("recipes.urls", namespace="recipes")),
             ]
@@ -0,0 +1,63 @@
+# Настройки gunicorn, подхватываются из рабочего каталога автоматически.
+# Django 2.2 не умеет ASGI, поэтому медленные выгрузки и загрузки картинок
+# не должны занимать весь воркер: каждый процесс обслуживает запросы
+# ограниченным пулом потоков (gthread).
+import glob
+import multiprocessing
+import os
+import tempfile
+
+bind = os.getenv("GUNICORN_BIND", "0:8000")
+# С LocMemCache у каждого процесса свой кеш: сброс версий в одном воркере
+# не виден остальным. Несколько воркеров только с общим кешем.
+shared_cache = not os.getenv(
+    "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+).endswith(("LocMemCache", "DummyCache"))
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+worker_class = "gthread" if threads > 1 else "sync"
+# Каждый поток держит своё соединение с базой до CONN_MAX_AGE секунд.
+# Воркеры × потоки не должны превышать max_connections PostgreSQL
+# (по умолчанию 100), часть соединений остаётся миграциям и консоли.
+db_max_connections = int(os.getenv("DB_MAX_CONNECTIONS", 80))
+if not shared_cache:
+    default_workers = 1
+elif threads > 1:
+    default_workers = multiprocessing.cpu_count() + 1
+else:
+    default_workers = multiprocessing.cpu_count() * 2 + 1
+default_workers = max(1, min(default_workers, db_max_connections // threads))
+workers = int(os.getenv("GUNICORN_WORKERS", default_workers))
+if workers > 1 and not shared_cache:
+    raise RuntimeError(
+        "GUNICORN_WORKERS > 1 требует общего кеша: задайте CACHE_BACKEND, "
+        "например django.core.cache.backends.filebased.FileBasedCache"
+    )
+if workers * threads > db_max_connections:
+    raise RuntimeError(
+        f"{workers} воркеров × {threads} потоков больше DB_MAX_CONNECTIONS "
+        f"({db_max_connections}) соединений с базой"
+    )
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+# Перезапуск воркеров ограничивает рост памяти долгоживущих процессов
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = max_requests // 10
+
+# Воркеры складывают метрики в общий каталог, /api/metrics/ суммирует их.
+# Переменная задаётся до запуска воркеров и наследуется ими.
+metrics_dir = os.getenv("METRICS_DIR")
+if not metrics_dir:
+    metrics_dir = os.environ["METRICS_DIR"] = tempfile.mkdtemp(
+        prefix="foodgram-metrics-")
+
+
+def on_starting(server):
+    # Счётчики прошлого запуска сервера не должны попасть в новый
+    for path in glob.glob(os.path.join(metrics_dir, "*.json")):
+        os.remove(path)
+
+
+def worker_exit(server, worker):
+    # Значения воркера переходят в общий файл завершённых
+    from backend.metrics import histograms
+    histograms.retire()
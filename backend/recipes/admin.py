@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 
+from .cache import invalidate_recipe
 from .models import (
     Ingredient,
     Tag,
@@ -8,7 +9,9 @@ from .models import (
     IngredientInRecipe,
     ShoppingList,
     Favorite,
+    ShoppingTotal,
 )
+from .shopping import refresh_recipe
 
 
 class IngredientInRecipeInline(admin.TabularInline):
@@ -52,13 +55,38 @@ class RecipeAdmin(admin.ModelAdmin):
     readonly_fields = ("add_in_favorites",)
 
     def add_in_favorites(self, obj):
-        return obj.favorites_lists.count()
+        return obj.favorites_count
+
+    def save_related(self, request, form, formsets, change):
+        # У строк состава нет обработчиков сигналов: итоги корзин
+        # пересчитываем по рецепту целиком
+        super().save_related(request, form, formsets, change)
+        refresh_recipe(form.instance.pk, None)
 
 
 @admin.register(IngredientInRecipe)
 class IngredientInRecipeAdmin(admin.ModelAdmin):
     empty_value_display = "--None--"
 
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.recipes_changed([obj.recipe])
+
+    def delete_queryset(self, request, queryset):
+        recipes = {row.recipe for row in queryset.select_related("recipe")}
+        super().delete_queryset(request, queryset)
+        self.recipes_changed(recipes)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self.recipes_changed([obj.recipe])
+
+    @staticmethod
+    def recipes_changed(recipes):
+        for recipe in recipes:
+            invalidate_recipe(recipe.pk, recipe.author_id)
+            refresh_recipe(recipe.pk, None)
+
 
 @admin.register(ShoppingList)
 class ShoppingListAdmin(admin.ModelAdmin):
@@ -68,3 +96,9 @@ class ShoppingListAdmin(admin.ModelAdmin):
 @admin.register(Favorite)
 class FavoritAdmin(admin.ModelAdmin):
     empty_value_display = "--None--"
+
+
+@admin.register(ShoppingTotal)
+class ShoppingTotalAdmin(admin.ModelAdmin):
+    list_display = ("user", "ingredient", "amount")
+    search_fields = ("user__username", "ingredient__name")
@@ -0,0 +1,272 @@
+import http.client
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+from user.models import Subscription
+from .models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingList,
+    Tag,
+)
+
+User = get_user_model()
+
+
+def seed(users, recipes, ingredients_per_recipe, ingredients=2000, tags=3,
+         favorites=10, carts=10, subscriptions=5, seed_value=0):
+    """Заполняет базу тестовыми данными пачками bulk_create"""
+    rnd = random.Random(seed_value)
+    Tag.objects.bulk_create(
+        Tag(name=f"tag {i}", color=f"#{i:06x}", slug=f"tag-{i}")
+        for i in range(tags)
+    )
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f"ingredient {i}", measurement_unit="г")
+        for i in range(ingredients)
+    )
+    User.objects.bulk_create(
+        User(email=f"user{i}@bench.local", username=f"user{i}",
+             first_name="Bench", last_name=str(i))
+        for i in range(users)
+    )
+    user_ids = list(User.objects.values_list("id", flat=True))
+    tag_ids = list(Tag.objects.values_list("id", flat=True))
+    ingredient_ids = list(Ingredient.objects.values_list("id", flat=True))
+    Token.objects.bulk_create(
+        Token(key=Token.generate_key(), user_id=user_id)
+        for user_id in user_ids
+    )
+    Recipe.objects.bulk_create(
+        Recipe(author_id=rnd.choice(user_ids), name=f"recipe {i}",
+               text="benchmark", cooking_time=rnd.randint(1, 120),
+               image="recipes/benchmark.png")
+        for i in range(recipes)
+    )
+    recipe_ids = list(Recipe.objects.values_list("id", flat=True))
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id in recipe_ids
+        for tag_id in rnd.sample(tag_ids, rnd.randint(1, len(tag_ids)))
+    )
+    IngredientInRecipe.objects.bulk_create(
+        (
+            IngredientInRecipe(recipe_id=recipe_id, ingredient_id=ingredient,
+                               amount=rnd.randint(1, 500))
+            for recipe_id in recipe_ids
+            for ingredient in rnd.sample(
+                ingredient_ids, min(ingredients_per_recipe, ingredients))
+        ),
+    )
+    for model, per_user, field, choices in (
+        (Favorite, favorites, "recipe_id", recipe_ids),
+        (ShoppingList, carts, "recipe_id", recipe_ids),
+        (Subscription, subscriptions, "following_id", user_ids),
+    ):
+        model.objects.bulk_create(
+            (
+                model(user_id=user_id, **{field: choice})
+                for user_id in user_ids
+                for choice in rnd.sample(
+                    choices, min(per_user, len(choices)))
+                if choice != user_id or field != "following_id"
+            ),
+        )
+    return user_ids, recipe_ids
+
+
+def percentile(values, share):
+    if not values:
+        return None
+    position = min(len(values) - 1, int(round(share * (len(values) - 1))))
+    return values[position]
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def run_scenario(scenario, tokens, recipe_ids, requests, concurrency):
+    """Прогоняет сценарий в нескольких потоках через тестовый клиент"""
+    samples = []
+    lock = threading.Lock()
+    errors = []
+
+    def worker(number):
+        client = Client()
+        rnd = random.Random(number)
+        local = []
+        try:
+            for _ in range(requests // concurrency):
+                token = pick_token(scenario, tokens, number, rnd)
+                headers = {}
+                if scenario.get("auth"):
+                    headers["HTTP_AUTHORIZATION"] = f"Token {token}"
+                counter = QueryCounter()
+                try:
+                    with connection.execute_wrapper(counter):
+                        started = time.perf_counter()
+                        for method, path in scenario["steps"](
+                                rnd, recipe_ids):
+                            response = getattr(client, method)(
+                                path, **headers)
+                            if response.status_code >= 500:
+                                errors.append(response.status_code)
+                            if getattr(response, "streaming", False):
+                                b"".join(response.streaming_content)
+                        elapsed = time.perf_counter() - started
+                except Exception as error:
+                    # Тестовый клиент пробрасывает исключения представлений
+                    errors.append(repr(error))
+                    continue
+                local.append((elapsed, counter.count))
+        finally:
+            connections.close_all()
+        with lock:
+            samples.extend(local)
+
+    wall = run_workers(worker, concurrency)
+    queries = [count for _, count in samples] or [0]
+    return dict(
+        summarize([elapsed for elapsed, _ in samples], errors, wall),
+        queries_per_request=round(sum(queries) / len(queries), 2),
+        max_queries=max(queries),
+    )
+
+
+def pick_token(scenario, tokens, number, rnd):
+    """У пишущих сценариев у каждого потока свой пользователь: иначе
+    потоки спорят за одни и те же строки избранного и корзины.
+    """
+    if scenario.get("writes"):
+        return tokens[number % len(tokens)]
+    return rnd.choice(tokens)
+
+
+def run_http_scenario(host, port, scenario, tokens, recipe_ids, requests,
+                      concurrency):
+    """Тот же сценарий, но по HTTP к запущенному серверу"""
+    samples = []
+    lock = threading.Lock()
+    errors = []
+
+    def worker(number):
+        client = http.client.HTTPConnection(host, port, timeout=60)
+        rnd = random.Random(number)
+        local = []
+        try:
+            for _ in range(requests // concurrency):
+                token = pick_token(scenario, tokens, number, rnd)
+                headers = {}
+                if scenario.get("auth"):
+                    headers["Authorization"] = f"Token {token}"
+                started = time.perf_counter()
+                try:
+                    for method, path in scenario["steps"](rnd, recipe_ids):
+                        client.request(method.upper(),
+                                       quote(path, safe="/?=&"),
+                                       headers=headers)
+                        response = client.getresponse()
+                        response.read()
+                        if response.status >= 500:
+                            errors.append(response.status)
+                except (OSError, http.client.HTTPException) as error:
+                    errors.append(repr(error))
+                    client.close()
+                    continue
+                local.append(time.perf_counter() - started)
+        finally:
+            client.close()
+        with lock:
+            samples.extend(local)
+
+    wall = run_workers(worker, concurrency)
+    return summarize(samples, errors, wall)
+
+
+def run_workers(worker, concurrency):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    return time.perf_counter() - started
+
+
+def summarize(samples, errors, wall):
+    latencies = sorted(samples)
+    if not latencies:
+        return {"requests": 0, "errors": len(errors),
+                "throughput_rps": None, "p50_ms": None,
+                "p95_ms": None, "p99_ms": None}
+    return {
+        "requests": len(samples),
+        "errors": len(errors),
+        "throughput_rps": round(len(samples) / wall, 2) if wall else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+SCENARIOS = {
+    "recipes": {
+        "steps": lambda rnd, ids: [("get", "/api/recipes/?limit=6")],
+    },
+    "recipes_auth": {
+        "auth": True,
+        "steps": lambda rnd, ids: [
+            ("get", f"/api/recipes/?limit=6&page={rnd.randint(1, 5)}")],
+    },
+    "recipe_detail": {
+        "auth": True,
+        "steps": lambda rnd, ids: [
+            ("get", f"/api/recipes/{rnd.choice(ids)}/")],
+    },
+    "tags": {
+        "steps": lambda rnd, ids: [("get", "/api/tags/")],
+    },
+    "ingredients": {
+        "steps": lambda rnd, ids: [
+            ("get", f"/api/ingredients/?name=ingredient {rnd.randint(1, 9)}")],
+    },
+    "subscriptions": {
+        "auth": True,
+        "steps": lambda rnd, ids: [
+            ("get", "/api/users/subscriptions/?recipes_limit=3")],
+    },
+    "download_shopping_cart": {
+        "auth": True,
+        "steps": lambda rnd, ids: [
+            ("get", "/api/recipes/download_shopping_cart/")],
+    },
+    "favorite_write": {
+        "auth": True,
+        "writes": True,
+        "steps": lambda rnd, ids: [
+            ("post", f"/api/recipes/{ids[0]}/favorite/"),
+            ("delete", f"/api/recipes/{ids[0]}/favorite/"),
+        ],
+    },
+    "cart_write": {
+        "auth": True,
+        "writes": True,
+        "steps": lambda rnd, ids: [
+            ("post", f"/api/recipes/{ids[0]}/shopping_cart/"),
+            ("delete", f"/api/recipes/{ids[0]}/shopping_cart/"),
+        ],
+    },
+}
@@ -0,0 +1,93 @@
+from contextlib import contextmanager
+
+from django.db import connections, router, transaction
+from django.db.models import F, OuterRef, Subquery
+
+from user.utils import lock_users
+from .models import Favorite, Recipe, ShoppingList
+from .shopping import refresh_cart
+
+COUNTER_FIELDS = {
+    Favorite: "favorites_count",
+    ShoppingList: "in_carts_count",
+}
+
+
+@contextmanager
+def user_lists_locked(user):
+    """Транзакция, в которой списки пользователя меняет только она"""
+    with transaction.atomic():
+        lock_users([user.pk])
+        yield
+
+
+def split_recipe_ids(model, user, ids):
+    """Одним запросом: какие рецепты есть и какие строки списка уже есть"""
+    rows = Recipe.objects.filter(id__in=ids).annotate(
+        list_row=Subquery(model.objects.filter(
+            user=user, recipe_id=OuterRef("pk")).values("pk")[:1])
+    ).order_by().values_list("id", "list_row")
+    in_list = {recipe_id: row for recipe_id, row in rows if row is not None}
+    found = {recipe_id for recipe_id, _ in rows}
+    return found, in_list
+
+
+def delete_rows(model, pks):
+    """Один DELETE по первичным ключам, без выборки объектов и сигналов"""
+    if not pks:
+        return
+    connection = connections[router.db_for_write(model)]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    placeholders = ", ".join(["%s"] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE {column} IN ({placeholders})",
+            list(pks),
+        )
+
+
+def bulk_add(model, user, ids):
+    """Добавляет рецепты в избранное или корзину одной вставкой.
+
+    bulk_create не шлёт сигналы, поэтому счётчики обновляются здесь же.
+    Под блокировкой пользователя набор новых строк точен, и счётчики
+    не расходятся с таблицей.
+    """
+    with user_lists_locked(user):
+        found, in_list = split_recipe_ids(model, user, ids)
+        added = found - set(in_list)
+        model.objects.bulk_create(
+            model(user=user, recipe_id=recipe_id) for recipe_id in added)
+        field = COUNTER_FIELDS[model]
+        Recipe.objects.filter(id__in=added).update(**{field: F(field) + 1})
+        if model is ShoppingList:
+            refresh_cart(user.pk, added)
+    return {
+        recipe_id: (
+            "added" if recipe_id in added
+            else "already_added" if recipe_id in in_list
+            else "not_found"
+        )
+        for recipe_id in ids
+    }
+
+
+def bulk_remove(model, user, ids):
+    """Удаляет рецепты из избранного или корзины одним DELETE"""
+    with user_lists_locked(user):
+        found, in_list = split_recipe_ids(model, user, ids)
+        delete_rows(model, in_list.values())
+        field = COUNTER_FIELDS[model]
+        Recipe.objects.filter(id__in=in_list, **{f"{field}__gt": 0}).update(
+            **{field: F(field) - 1})
+        if model is ShoppingList:
+            refresh_cart(user.pk, in_list)
+    return {
+        recipe_id: (
+            "removed" if recipe_id in in_list
+            else "not_in_list" if recipe_id in found
+            else "not_found"
+        )
+        for recipe_id in ids
+    }
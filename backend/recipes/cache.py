@@ -0,0 +1,220 @@
+import hashlib
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import transaction
+
+from user.utils import get_following_ids
+from .models import Favorite, Recipe, ShoppingList
+
+RESPONSE_TIMEOUT = 300
+FRAGMENT_TIMEOUT = 24 * 60 * 60
+LIST_VERSION_KEY = "recipes:version"
+# Теги и ингредиенты входят в представление каждого рецепта
+CATALOG_VERSION_KEY = "recipes:version:catalog"
+# Снимки справочников и индекс ингредиентов живут в памяти каждого
+# процесса и пересобираются, когда версия в общем кеше меняется
+TAGS_VERSION_KEY = "recipes:version:tags"
+INGREDIENTS_VERSION_KEY = "recipes:version:ingredients"
+USER_FILTERS = ("is_favorited", "is_in_shopping_cart")
+
+
+def recipe_version_key(recipe_id):
+    return f"recipes:version:recipe:{recipe_id}"
+
+
+def author_version_key(author_id):
+    return f"recipes:version:author:{author_id}"
+
+
+def new_version():
+    # Версия от времени, а не с нуля: если ключ вытеснят из кеша,
+    # старые ответы не совпадут со свежей версией
+    return int(time.time() * 1000)
+
+
+def get_versions(*keys):
+    versions = cache.get_many(keys)
+    missing = {key: new_version() for key in keys if key not in versions}
+    for key, version in missing.items():
+        if not cache.add(key, version, None):
+            missing[key] = cache.get(key, version)
+    versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump(*keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, new_version(), None)
+
+
+def invalidate_recipe(recipe_id, author_id):
+    """Сбрасывает ответы по рецепту после фиксации транзакции"""
+    transaction.on_commit(lambda: bump(
+        LIST_VERSION_KEY,
+        recipe_version_key(recipe_id),
+        author_version_key(author_id),
+    ))
+
+
+def invalidate_author(author_id):
+    transaction.on_commit(lambda: bump(
+        LIST_VERSION_KEY,
+        author_version_key(author_id),
+    ))
+
+
+def invalidate_catalog(*keys):
+    transaction.on_commit(
+        lambda: bump(LIST_VERSION_KEY, CATALOG_VERSION_KEY, *keys))
+
+
+def query_digest(request):
+    params = sorted(
+        (key, sorted(values)) for key, values in request.query_params.lists()
+    )
+    raw = f"{request.get_host()}|{params}".encode()
+    return hashlib.md5(raw).hexdigest()
+
+
+def list_cache_key(request):
+    author = request.query_params.get("author")
+    if author and author.isdigit():
+        # Список автора зависит и от справочников, как ответ по рецепту
+        keys = (author_version_key(author), CATALOG_VERSION_KEY)
+    else:
+        keys = (LIST_VERSION_KEY,)
+    versions = ":".join(str(version) for version in get_versions(*keys))
+    return f"recipes:list:{versions}:{query_digest(request)}"
+
+
+def detail_cache_key(request, pk):
+    # Теги и ингредиенты входят в ответ, их переименование тоже сбрасывает
+    version, catalog = get_versions(
+        recipe_version_key(pk), CATALOG_VERSION_KEY)
+    return (f"recipes:detail:{pk}:{version}:{catalog}:"
+            f"{query_digest(request)}")
+
+
+def with_flags(recipe, favorited=False, in_cart=False, subscribed=False):
+    return dict(
+        recipe,
+        is_favorited=favorited,
+        is_in_shopping_cart=in_cart,
+        author=dict(recipe["author"], is_subscribed=subscribed),
+    )
+
+
+def overlay_user_flags(request, recipes):
+    """Подставляет флаги пользователя в общие для всех данные"""
+    user = request.user
+    if user.is_anonymous:
+        return recipes
+    ids = [recipe["id"] for recipe in recipes]
+    favorited = set(Favorite.objects.filter(
+        user=user, recipe_id__in=ids).values_list("recipe_id", flat=True))
+    in_cart = set(ShoppingList.objects.filter(
+        user=user, recipe_id__in=ids).values_list("recipe_id", flat=True))
+    following = get_following_ids(request)
+    return [
+        with_flags(
+            recipe,
+            recipe["id"] in favorited,
+            recipe["id"] in in_cart,
+            recipe["author"]["id"] in following,
+        )
+        for recipe in recipes
+    ]
+
+
+def fragment_key(request, recipe_id):
+    host = hashlib.md5(request.get_host().encode()).hexdigest()[:8]
+    return f"recipes:fragment:{host}:{recipe_id}"
+
+
+def fragment_versions(recipes):
+    """Версии рецепта, автора и справочников для каждого рецепта"""
+    return {
+        recipe.pk: (
+            recipe_version_key(recipe.pk),
+            author_version_key(recipe.author_id),
+            CATALOG_VERSION_KEY,
+        )
+        for recipe in recipes
+    }
+
+
+def render_recipes(serializer, recipes):
+    """Представления рецептов из кеша фрагментов с флагами пользователя.
+
+    Фрагмент хранит общую для всех часть ответа вместе с версиями, по
+    которым он собран. Фрагменты и текущие версии приходят одним get_many,
+    сериализуются только устаревшие и отсутствующие рецепты.
+    """
+    request = serializer.context["request"]
+    keys = {recipe.pk: fragment_key(request, recipe.pk) for recipe in recipes}
+    version_keys = fragment_versions(recipes)
+    wanted = {key for group in version_keys.values() for key in group}
+    found = cache.get_many([*keys.values(), *wanted])
+    missing = [key for key in wanted if key not in found]
+    found.update(zip(missing, get_versions(*missing)))
+
+    fragments = {}
+    stale = []
+    for recipe in recipes:
+        current = tuple(found[key] for key in version_keys[recipe.pk])
+        cached = found.get(keys[recipe.pk])
+        if cached is not None and cached[0] == current:
+            fragments[recipe.pk] = cached[1]
+        else:
+            stale.append(recipe)
+    if stale:
+        rendered = {
+            recipe.pk: with_flags(serializer.render_fragment(recipe))
+            for recipe in with_related(stale)
+        }
+        cache.set_many({
+            keys[pk]: (
+                tuple(found[key] for key in version_keys[pk]), fragment)
+            for pk, fragment in rendered.items()
+        }, FRAGMENT_TIMEOUT)
+        fragments.update(rendered)
+
+    if request.user.is_anonymous:
+        following = set()
+    else:
+        following = get_following_ids(request)
+    return [
+        with_flags(
+            fragments[recipe.pk],
+            serializer.get_is_favorited(recipe),
+            serializer.get_is_in_shopping_cart(recipe),
+            recipe.author_id in following,
+        )
+        # Рецепт, удалённый после выборки страницы, with_related не вернёт
+        for recipe in recipes if recipe.pk in fragments
+    ]
+
+
+def with_related(recipes):
+    """Рецепты с авторами, тегами и ингредиентами для сериализации"""
+    if all(
+        "tags" in getattr(recipe, "_prefetched_objects_cache", {})
+        for recipe in recipes
+    ):
+        return recipes
+    # Флаги во фрагмент не попадают, постоянные аннотации избавляют
+    # сериализатор от запросов за ними
+    fetched = Recipe.objects.with_related().with_user_flags(
+        AnonymousUser()).in_bulk([recipe.pk for recipe in recipes])
+    return [fetched[recipe.pk] for recipe in recipes if recipe.pk in fetched]
+
+
+def is_cacheable(request):
+    if request.user.is_anonymous:
+        return True
+    return not any(request.query_params.get(name) for name in USER_FILTERS)
@@ -0,0 +1,80 @@
+import heapq
+
+from django.conf import settings
+
+from user.models import Subscription, User
+from .models import Recipe, TimelineEntry
+
+
+def fans_in(author_id):
+    """У автора слишком много подписчиков, его рецепты читаются при запросе.
+
+    Счётчик читается из базы: у объекта автора (request.user из кеша
+    токенов, instance.following в сигнале) он может быть устаревшим.
+    """
+    return User.objects.filter(
+        pk=author_id, followers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).exists()
+
+
+def fan_out(recipe):
+    """Раскладывает новый рецепт по лентам подписчиков автора"""
+    if fans_in(recipe.author_id):
+        return
+    follower_ids = Subscription.objects.filter(
+        following_id=recipe.author_id).values_list("user_id", flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, recipe_id=recipe.pk,
+                          author_id=recipe.author_id)
+            for user_id in follower_ids
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Последние рецепты автора сразу после подписки"""
+    if fans_in(author_id):
+        return
+    recipe_ids = Recipe.objects.filter(author_id=author_id).order_by(
+        "-id").values_list("id", flat=True)[:settings.FEED_BACKFILL]
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, recipe_id=recipe_id,
+                          author_id=author_id)
+            for recipe_id in recipe_ids
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def unfollow(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def feed_ids(user, before=None, limit=6):
+    """id рецептов страницы ленты по убыванию и признак следующей страницы.
+
+    Своя лента читается диапазоном по индексу, рецепты авторов с большим
+    числом подписчиков добираются запросом по их id и сливаются с ней.
+    """
+    timeline = TimelineEntry.objects.filter(user=user)
+    fan_in = Recipe.objects.filter(
+        author__following__user=user,
+        author__followers_count__gt=settings.FEED_FANOUT_LIMIT,
+    )
+    if before is not None:
+        timeline = timeline.filter(recipe_id__lt=before)
+        fan_in = fan_in.filter(id__lt=before)
+    sources = (
+        timeline.order_by("-recipe_id").values_list("recipe_id", flat=True),
+        fan_in.order_by("-id").values_list("id", flat=True),
+    )
+    merged = heapq.merge(
+        *(list(source[:limit + 1]) for source in sources), reverse=True)
+    ids = []
+    for recipe_id in merged:
+        if not ids or ids[-1] != recipe_id:
+            ids.append(recipe_id)
+    return ids[:limit], len(ids) > limit
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+from .images import image_pixels, image_srcset
+
+
+class RecipeImageField(Base64ImageField):
+    """Фото рецепта: base64 в JSON или файл из multipart/form-data"""
+    default_error_messages = {
+        "too_large": "Размер изображения больше {max_size} байт",
+        "too_many_pixels": "Изображение больше {max_pixels} пикселей",
+    }
+
+    def validate_empty_values(self, data):
+        # Слишком большой файл бросает обработчик загрузки, и поле
+        # приходит пустым
+        request = self.context.get("request")
+        if self.field_name in getattr(request, "oversized_files", ()):
+            self.fail("too_large", max_size=settings.RECIPE_IMAGE_MAX_SIZE)
+        return super().validate_empty_values(data)
+
+    def to_internal_value(self, data):
+        max_size = settings.RECIPE_IMAGE_MAX_SIZE
+        if isinstance(data, UploadedFile):
+            if data.size > max_size:
+                self.fail("too_large", max_size=max_size)
+            image = serializers.ImageField.to_internal_value(self, data)
+        else:
+            if isinstance(data, str) and len(data) * 3 // 4 > max_size:
+                self.fail("too_large", max_size=max_size)
+            image = super().to_internal_value(data)
+        max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+        if image is not None and image_pixels(image) > max_pixels:
+            self.fail("too_many_pixels", max_pixels=max_pixels)
+        return image
+
+
+class ImageSrcsetField(serializers.ReadOnlyField):
+    def __init__(self, **kwargs):
+        kwargs.setdefault("source", "image")
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return image_srcset(value.name, self.context.get("request"))
@@ -1,20 +1,24 @@
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as rest_framework_filter
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import BaseFilterBackend
 
 from .models import Recipe, Tag, User
-
-
-class IngredientFilter(SearchFilter):
-    search_param = "name"
+from .search import search_recipes
 
 
 class RecipeFilter(rest_framework_filter.FilterSet):
+    """Фильтры рецептов через EXISTS, без JOIN и дублей строк.
+
+    is_favorited и is_in_shopping_cart используют аннотации
+    RecipeQuerySet.with_user_flags из queryset представления.
+    """
     author = rest_framework_filter.ModelChoiceFilter(
         queryset=User.objects.all())
     tags = rest_framework_filter.ModelMultipleChoiceFilter(
         field_name="tags__slug",
         queryset=Tag.objects.all(),
         to_field_name="slug",
+        method="filter_tags",
     )
     is_favorited = rest_framework_filter.BooleanFilter(
         method="filter_is_favorited")
@@ -22,16 +26,37 @@ class RecipeFilter(rest_framework_filter.FilterSet):
         method="filter_is_in_shopping_cart"
     )
 
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.annotate(
+            has_tags=Exists(Recipe.tags.through.objects.filter(
+                recipe_id=OuterRef("pk"),
+                tag_id__in=[tag.id for tag in value],
+            ))
+        ).filter(has_tags=True)
+
     def filter_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return queryset.filter(favorites_lists__user=self.request.user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return queryset.filter(shopping_lists__user=self.request.user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
 
     class Meta:
         model = Recipe
         fields = ("author", "tags", "is_favorited", "is_in_shopping_cart")
+
+
+class RecipeSearchFilter(BaseFilterBackend):
+    """Полнотекстовый поиск по названию и описанию: ?search="""
+    search_param = "search"
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "").strip()
+        if not query:
+            return queryset
+        return search_recipes(queryset, query)
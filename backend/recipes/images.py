@@ -0,0 +1,132 @@
+import hashlib
+import re
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+WIDTHS = (320, 640, 1280)
+FORMATS = (
+    ("webp", "WEBP", "webp"),
+    ("jpeg", "JPEG", "jpg"),
+)
+# Ширина оригинала в имени файла: по ней srcset знает, какие копии есть,
+# не обращаясь к хранилищу
+EXIF_ORIENTATION = 0x0112
+# Повороты на 90 градусов меняют ширину и высоту местами
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+HASHED_NAME = re.compile(
+    r"^recipes/(?P<digest>[0-9a-f]{64})-(?P<width>\d+)\.\w+$")
+
+
+def derivative_name(digest, width, extension):
+    return f"recipes/{digest}/{width}.{extension}"
+
+
+def derivative_widths(original_width):
+    """Ширины копий: картинка не растягивается, узкий оригинал даёт
+    копию своей ширины вместо более широких"""
+    return sorted({min(width, original_width) for width in WIDTHS})
+
+
+def save_once(name, content):
+    if not default_storage.exists(name):
+        if isinstance(content, bytes):
+            content = ContentFile(content)
+        default_storage.save(name, content)
+
+
+def resized(image, widths):
+    """Копии от самой широкой к самой узкой, каждая уменьшается из
+    предыдущей: полноразмерная картинка уменьшается один раз"""
+    current = image
+    for width in sorted(widths, reverse=True):
+        if current.width != width:
+            height = max(1, round(current.height * width / current.width))
+            current = current.resize((width, height), Image.LANCZOS)
+        yield width, current
+
+
+def encode(image, pillow_format):
+    if pillow_format == "JPEG" and image.mode != "RGB":
+        background = Image.new("RGB", image.size, "white")
+        rgba = image.convert("RGBA")
+        background.paste(rgba, mask=rgba.split()[-1])
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, pillow_format, quality=80, optimize=True)
+    return buffer.getvalue()
+
+
+def file_digest(upload):
+    digest = hashlib.sha256()
+    upload.seek(0)
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def store_recipe_image(upload):
+    """Сохраняет фото рецепта под хешем содержимого вместе с копиями
+    нужной ширины в WebP и JPEG, повторная загрузка ничего не пишет.
+
+    Файл читается кусками, в памяти целиком оказываются только пиксели,
+    размер которых ограничен при валидации. JPEG декодируется сразу
+    уменьшенным, но не уже самой широкой копии.
+    """
+    digest = file_digest(upload)
+    with Image.open(upload) as image:
+        extension = (image.format or "jpeg").lower()
+        orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+        if orientation in TRANSPOSED_ORIENTATIONS:
+            original_width = image.height
+        else:
+            original_width = image.width
+        name = f"recipes/{digest}-{original_width}.{extension}"
+        if default_storage.exists(name):
+            return name
+        widths = derivative_widths(original_width)
+        if image.format == "JPEG":
+            image.draft("RGB", (widths[-1], widths[-1]))
+        if orientation != 1:
+            image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        for width, copy in resized(image, widths):
+            for _, pillow_format, derivative_extension in FORMATS:
+                save_once(
+                    derivative_name(digest, width, derivative_extension),
+                    encode(copy, pillow_format),
+                )
+    upload.seek(0)
+    save_once(name, upload)
+    return name
+
+
+def image_pixels(upload):
+    """Размер картинки по заголовку, без декодирования пикселей"""
+    upload.seek(0)
+    with Image.open(upload) as image:
+        width, height = image.size
+    upload.seek(0)
+    return width * height
+
+
+def image_srcset(name, request=None):
+    """Готовые значения srcset по форматам для обработанных фото"""
+    match = HASHED_NAME.match(name or "")
+    if match is None:
+        return {}
+    srcset = {}
+    for key, _, extension in FORMATS:
+        sources = []
+        for width in derivative_widths(int(match.group("width"))):
+            url = default_storage.url(
+                derivative_name(match.group("digest"), width, extension))
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            sources.append(f"{url} {width}w")
+        srcset[key] = ", ".join(sources)
+    return srcset
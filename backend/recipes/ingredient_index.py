@@ -0,0 +1,97 @@
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+from .cache import INGREDIENTS_VERSION_KEY, get_versions
+from .models import Ingredient
+
+MIN_FUZZY_LENGTH = 3
+FUZZY_THRESHOLD = 0.3
+
+
+def normalize(text):
+    return text.casefold().replace("ё", "е").strip()
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Сначала идут совпадения по началу названия, затем по подстроке,
+    затем похожие названия по триграммам (опечатки).
+    """
+
+    def __init__(self, rows):
+        self.rows = sorted(rows, key=lambda row: normalize(row["name"]))
+        self.names = [normalize(row["name"]) for row in self.rows]
+        self.trigrams = {}
+        self.trigram_counts = []
+        for position, name in enumerate(self.names):
+            name_trigrams = trigrams(name)
+            self.trigram_counts.append(len(name_trigrams))
+            for trigram in name_trigrams:
+                self.trigrams.setdefault(trigram, []).append(position)
+
+    @classmethod
+    def from_db(cls):
+        return cls(
+            Ingredient.objects.values("id", "name", "measurement_unit")
+        )
+
+    def prefix_positions(self, query):
+        start = bisect_left(self.names, query)
+        end = bisect_left(self.names, query + "\uffff", lo=start)
+        return range(start, end)
+
+    def fuzzy_positions(self, query, exclude):
+        query_trigrams = trigrams(query)
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self.trigrams.get(trigram, ()))
+        scored = []
+        for position, common in shared.items():
+            if position in exclude:
+                continue
+            total = (
+                len(query_trigrams) + self.trigram_counts[position] - common
+            )
+            score = common / total
+            if score >= FUZZY_THRESHOLD:
+                scored.append((-score, position))
+        return [position for _, position in sorted(scored)]
+
+    def search(self, query):
+        query = normalize(query)
+        if not query:
+            return list(self.rows)
+        positions = list(self.prefix_positions(query))
+        found = set(positions)
+        positions += [
+            position for position, name in enumerate(self.names)
+            if query in name and position not in found
+        ]
+        if len(query) >= MIN_FUZZY_LENGTH:
+            found = set(positions)
+            positions += self.fuzzy_positions(query, found)
+        return [self.rows[position] for position in positions]
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_ingredient_index():
+    """Индекс процесса, перестроенный, если справочник изменился"""
+    global _index
+    version, = get_versions(INGREDIENTS_VERSION_KEY)
+    current = _index
+    if current is None or current[0] != version:
+        with _lock:
+            if _index is None or _index[0] != version:
+                _index = (version, IngredientIndex.from_db())
+            current = _index
+    return current[1]
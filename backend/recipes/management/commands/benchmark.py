@@ -0,0 +1,121 @@
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment
+from rest_framework.authtoken.models import Token
+
+from recipes.benchmark import SCENARIOS, run_scenario, seed
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ("git", "rev-parse", "HEAD"), stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный прогон API на отдельной тестовой базе: "
+        "пропускная способность, p50/p95/p99 и число SQL-запросов"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--recipes", type=int, default=1000)
+        parser.add_argument("--ingredients-per-recipe", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument(
+            "--scenario", action="append", choices=sorted(SCENARIOS),
+            help="Можно указать несколько раз, по умолчанию все",
+        )
+        parser.add_argument("--output", default="benchmark.json")
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency должен быть больше нуля")
+        names = options["scenario"] or sorted(SCENARIOS)
+        writes = any(SCENARIOS[name].get("writes") for name in names)
+        if writes and options["users"] < options["concurrency"]:
+            raise CommandError(
+                "Пишущим сценариям нужен свой пользователь на поток: "
+                "--users должен быть не меньше --concurrency")
+        setup_test_environment()
+        if connection.vendor == "sqlite":
+            # Потокам нужна общая база на диске, а не в памяти
+            handle, test_name = tempfile.mkstemp(suffix=".sqlite3")
+            os.close(handle)
+            connection.settings_dict.setdefault("TEST", {})
+            connection.settings_dict["TEST"]["NAME"] = test_name
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        with open(options["output"], "w", encoding="utf-8") as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+        self.stdout.write(
+            self.style.SUCCESS(f"Результаты записаны в {options['output']}"))
+
+    def prepare(self, options):
+        started = time.perf_counter()
+        _, recipe_ids = seed(
+            options["users"],
+            options["recipes"],
+            options["ingredients_per_recipe"],
+        )
+        call_command("reconcile_counters", stdout=open(os.devnull, "w"))
+        # Сид пишет корзины и подписки через bulk_create, минуя сигналы
+        call_command("rebuild_shopping_totals", stdout=open(os.devnull, "w"))
+        call_command("rebuild_timelines", stdout=open(os.devnull, "w"))
+        self.stdout.write(
+            f"Данные созданы за {time.perf_counter() - started:.1f} с")
+        tokens = list(Token.objects.values_list("key", flat=True))
+        return tokens, recipe_ids
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"{name:<24} {result['throughput_rps']!s:>9} rps  "
+            f"p50 {result['p50_ms']!s:>8} ms  "
+            f"p95 {result['p95_ms']!s:>8} ms  "
+            f"p99 {result['p99_ms']!s:>8} ms  "
+            f"SQL {result.get('queries_per_request', '-')!s:>6}  "
+            f"ошибок {result['errors']}"
+        )
+
+    def run(self, options):
+        tokens, recipe_ids = self.prepare(options)
+        scenarios = {}
+        for name in options["scenario"] or sorted(SCENARIOS):
+            cache.clear()
+            result = run_scenario(
+                SCENARIOS[name], tokens, recipe_ids,
+                options["requests"], options["concurrency"],
+            )
+            scenarios[name] = result
+            self.report(name, result)
+        return {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "database": connection.vendor,
+            "dataset": {
+                "users": options["users"],
+                "recipes": options["recipes"],
+                "ingredients_per_recipe": options["ingredients_per_recipe"],
+            },
+            "requests": options["requests"],
+            "concurrency": options["concurrency"],
+            "scenarios": scenarios,
+        }
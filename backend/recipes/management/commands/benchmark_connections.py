@@ -0,0 +1,93 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from recipes.benchmark import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Стоимость соединения с базой на запрос: новое соединение на каждый "
+        "запрос против постоянного с проверкой и настройками SQLite"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--output", default="benchmark_connections.json")
+
+    def handle(self, *args, **options):
+        configured = connection.settings_dict
+        options_dict = configured.get("OPTIONS", {})
+        profiles = {
+            "per_request": dict(
+                configured,
+                CONN_MAX_AGE=0,
+                CONN_HEALTH_CHECKS=False,
+                OPTIONS={
+                    key: value for key, value in options_dict.items()
+                    if key != "pragmas"
+                },
+            ),
+            "persistent": dict(
+                configured,
+                CONN_MAX_AGE=configured.get("CONN_MAX_AGE") or 60,
+                CONN_HEALTH_CHECKS=True,
+            ),
+        }
+        results = {}
+        try:
+            for name, settings_dict in profiles.items():
+                connection.close()
+                connection.settings_dict = settings_dict
+                results[name] = self.measure(options["requests"])
+                self.stdout.write(
+                    f"{name:<12} соединений {results[name]['connections']:>5}"
+                    f"  среднее {results[name]['mean_us']:>9} мкс"
+                    f"  p95 {results[name]['p95_us']:>9} мкс"
+                    f"  p99 {results[name]['p99_us']:>9} мкс"
+                )
+        finally:
+            connection.close()
+            connection.settings_dict = configured
+        with open(options["output"], "w", encoding="utf-8") as file:
+            json.dump({
+                "database": connection.vendor,
+                "conn_max_age": settings.CONN_MAX_AGE,
+                "requests": options["requests"],
+                "profiles": results,
+            }, file, ensure_ascii=False, indent=2)
+        self.stdout.write(
+            self.style.SUCCESS(f"Результаты записаны в {options['output']}"))
+
+    def measure(self, requests):
+        """Цикл запроса как в обработчике Django: сигналы и один SELECT"""
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        connection_created.connect(count)
+        samples = []
+        try:
+            for _ in range(requests):
+                started = time.perf_counter()
+                request_started.send(sender=self.__class__)
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                    cursor.fetchone()
+                request_finished.send(sender=self.__class__)
+                samples.append(time.perf_counter() - started)
+        finally:
+            connection_created.disconnect(count)
+        samples.sort()
+        return {
+            "connections": len(opened),
+            "mean_us": round(sum(samples) / len(samples) * 1e6, 1),
+            "p95_us": round(percentile(samples, 0.95) * 1e6, 1),
+            "p99_us": round(percentile(samples, 0.99) * 1e6, 1),
+        }
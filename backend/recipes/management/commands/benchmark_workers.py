@@ -0,0 +1,128 @@
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connection
+
+from recipes.benchmark import SCENARIOS, run_http_scenario
+from .benchmark import Command as BenchmarkCommand
+
+READ_SCENARIOS = (
+    "recipes",
+    "recipe_detail",
+    "ingredients",
+    "tags",
+    "subscriptions",
+    "download_shopping_cart",
+)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Command(BenchmarkCommand):
+    help = (
+        "Сравнивает синхронные воркеры gunicorn и воркеры с пулом потоков "
+        "(gthread) при одинаковом числе процессов"
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--threads", type=int, default=8)
+        parser.set_defaults(concurrency=16, output="benchmark_workers.json")
+
+    def run(self, options):
+        tokens, recipe_ids = self.prepare(options)
+        # Серверы открывают базу сами, держать её открытой незачем
+        connection.close()
+        modes = {}
+        for mode, threads in (("sync", 1), ("gthread", options["threads"])):
+            self.stdout.write(
+                f"{mode}: воркеров {options['workers']}, потоков {threads}")
+            with GunicornServer(options["workers"], threads) as port:
+                modes[mode] = {}
+                for name in options["scenario"] or READ_SCENARIOS:
+                    result = run_http_scenario(
+                        "127.0.0.1", port, SCENARIOS[name], tokens,
+                        recipe_ids, options["requests"],
+                        options["concurrency"],
+                    )
+                    modes[mode][name] = result
+                    self.report(name, result)
+        return {
+            "database": connection.vendor,
+            "dataset": {
+                "users": options["users"],
+                "recipes": options["recipes"],
+                "ingredients_per_recipe": options["ingredients_per_recipe"],
+            },
+            "workers": options["workers"],
+            "threads": options["threads"],
+            "requests": options["requests"],
+            "concurrency": options["concurrency"],
+            "modes": modes,
+        }
+
+
+class GunicornServer:
+    """Запускает gunicorn на тестовой базе и ждёт, пока он начнёт отвечать"""
+
+    def __init__(self, workers, threads):
+        self.workers = workers
+        self.threads = threads
+        self.process = None
+        self.cache_dir = None
+
+    def __enter__(self):
+        executable = shutil.which("gunicorn")
+        if executable is None:
+            raise CommandError("gunicorn не установлен")
+        port = free_port()
+        env = dict(
+            os.environ,
+            DB_NAME=connection.settings_dict["NAME"],
+            GUNICORN_WORKERS=str(self.workers),
+            GUNICORN_THREADS=str(self.threads),
+            GUNICORN_BIND=f"127.0.0.1:{port}",
+            GUNICORN_MAX_REQUESTS="0",
+        )
+        if not settings.SHARED_CACHE:
+            # Воркерам нужен общий кеш, как и в боевой конфигурации
+            self.cache_dir = tempfile.mkdtemp(prefix="foodgram-cache-")
+            env.update(
+                CACHE_BACKEND=(
+                    "django.core.cache.backends.filebased.FileBasedCache"),
+                CACHE_LOCATION=self.cache_dir,
+            )
+        self.process = subprocess.Popen(
+            (executable, "backend.wsgi:application",
+             "--config", "gunicorn.conf.py"),
+            cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError("gunicorn завершился при запуске")
+            try:
+                socket.create_connection(("127.0.0.1", port), 1).close()
+                return port
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise CommandError("gunicorn не ответил за 30 секунд")
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.wait()
+        if self.cache_dir is not None:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
@@ -1,7 +1,18 @@
+import csv
 import json
+import os
+import re
+import time
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from recipes.cache import (
+    INGREDIENTS_VERSION_KEY,
+    TAGS_VERSION_KEY,
+    invalidate_catalog,
+)
 from recipes.models import Ingredient, Tag
 
 
@@ -11,24 +22,122 @@ tag = [
     {"name": "ужин", "color": "#660099", "slug": "dinner"},
 ]
 
+DEFAULT_PATHS = (
+    os.path.join(settings.BASE_DIR, "..", "data", "ingredients.json"),
+    os.path.join(settings.BASE_DIR, "ingredients.json"),
+)
+CHUNK_SIZE = 64 * 1024
+SEPARATORS = re.compile(r"[\s,]*")
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    """Потоковый разбор JSON-массива без загрузки файла целиком"""
+    decoder = json.JSONDecoder()
+    buffer = file.read(CHUNK_SIZE).lstrip()
+    if not buffer.startswith("["):
+        raise CommandError("Ожидается JSON-массив ингредиентов")
+    position = 1
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if buffer.startswith("]", position):
+            return
+        try:
+            row, position = decoder.raw_decode(buffer, position)
+        except ValueError:
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                raise CommandError("Файл JSON обрывается")
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield row["name"], row["measurement_unit"]
+
+
+READERS = {".csv": read_csv, ".json": read_json}
+
 
 class Command(BaseCommand):
+    help = "Загружает ингредиенты из JSON или CSV без удаления существующих"
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="*")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
     def handle(self, *args, **options):
-        Ingredient.objects.all().delete()
-        with open("./ingredients.json", encoding="utf-8") as file:
-            reader = json.load(file)
+        paths = options["paths"] or [
+            next((path for path in DEFAULT_PATHS if os.path.exists(path)),
+                 DEFAULT_PATHS[0])
+        ]
+        batch_size = options["batch_size"]
+        with transaction.atomic():
+            known = set(
+                Ingredient.objects.values_list("name", "measurement_unit")
+            )
             counter = 0
-            for row in reader:
-                Ingredient.objects.create(
-                    name=row["name"], measurement_unit=row["measurement_unit"]
+            for path in paths:
+                counter += self.load(path, known, batch_size)
+            for elem in tag:
+                Tag.objects.get_or_create(
+                    name=elem["name"],
+                    color=elem["color"],
+                    slug=elem["slug"],
                 )
-                counter += 1
-        for elem in tag:
-            Tag.objects.get_or_create(
-                name=elem["name"],
-                color=elem["color"],
-                slug=elem["slug"],
-            )
+            # bulk_create обходит сигналы, версии поднимаем сами
+            invalidate_catalog(INGREDIENTS_VERSION_KEY, TAGS_VERSION_KEY)
         self.stdout.write(
             self.style.SUCCESS(f"В базу добавлено {counter} записей")
         )
+
+    def load(self, path, known, batch_size):
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError(f"Неизвестный формат файла: {path}")
+        started = time.monotonic()
+        created = read = 0
+        batch = []
+        with open(path, encoding="utf-8") as file:
+            for name, measurement_unit in reader(file):
+                read += 1
+                key = (name.strip(), measurement_unit.strip())
+                if key in known:
+                    continue
+                known.add(key)
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    created += self.flush(batch)
+                    self.progress(path, read, created, started)
+        created += self.flush(batch)
+        self.progress(path, read, created, started)
+        return created
+
+    @staticmethod
+    def flush(batch):
+        """Пакетная вставка в обход ORM, дубликаты пропускаются базой"""
+        if not batch:
+            return 0
+        ops = connection.ops
+        sql = "{} {} ({}, {}) VALUES (%s, %s) {}".format(
+            ops.insert_statement(ignore_conflicts=True),
+            ops.quote_name(Ingredient._meta.db_table),
+            ops.quote_name("name"),
+            ops.quote_name("measurement_unit"),
+            ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, batch)
+        size = len(batch)
+        batch.clear()
+        return size
+
+    def progress(self, path, read, created, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f"{path}: прочитано {read}, добавлено {created}, "
+            f"{int(read / elapsed)} строк/с"
+        )
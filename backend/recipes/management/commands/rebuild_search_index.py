@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from recipes.search import rebuild_search_index, setup_search_index
+
+
+class Command(BaseCommand):
+    help = "Создаёт и заново заполняет полнотекстовый индекс рецептов"
+
+    def handle(self, *args, **options):
+        setup_search_index()
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS("Индекс рецептов перестроен"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import ShoppingList, ShoppingTotal
+from recipes.shopping import refresh_totals
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает итоги списков покупок по содержимому корзин"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            ShoppingTotal.objects.all().delete()
+            refresh_totals(
+                ShoppingList.objects.order_by()
+                .values_list("user_id", flat=True).distinct()
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Итогов списков покупок: {ShoppingTotal.objects.count()}"
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.feed import backfill
+from recipes.models import TimelineEntry
+from user.models import Subscription
+
+
+class Command(BaseCommand):
+    help = "Заново заполняет ленты подписчиков по текущим подпискам"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            TimelineEntry.objects.all().delete()
+            subscriptions = Subscription.objects.values_list(
+                "user_id", "following_id").iterator()
+            for user_id, author_id in subscriptions:
+                backfill(user_id, author_id)
+        self.stdout.write(self.style.SUCCESS(
+            f"Записей в лентах: {TimelineEntry.objects.count()}"
+        ))
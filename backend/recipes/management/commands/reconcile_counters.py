@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingList
+from user.models import Subscription
+
+User = get_user_model()
+
+
+def count_of(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef("pk")})
+        .order_by()
+        .values(field)
+        .annotate(total=Count("pk"))
+        .values("total"),
+        output_field=IntegerField(),
+    ), 0)
+
+
+COUNTERS = (
+    (Recipe, "favorites_count", Favorite, "recipe"),
+    (Recipe, "in_carts_count", ShoppingList, "recipe"),
+    (User, "recipes_count", Recipe, "author"),
+    (User, "followers_count", Subscription, "following"),
+)
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает денормализованные счётчики рецептов и авторов"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for model, field, source, source_field in COUNTERS:
+                actual = count_of(source, source_field)
+                drifted = list(
+                    model.objects.annotate(actual=actual)
+                    .exclude(**{field: F("actual")})
+                    .values_list("pk", flat=True)
+                )
+                if drifted:
+                    model.objects.filter(pk__in=drifted).update(
+                        **{field: actual})
+                self.stdout.write(
+                    f"{model.__name__}.{field}: исправлено {len(drifted)}"
+                )
+        self.stdout.write(self.style.SUCCESS("Счётчики пересчитаны"))
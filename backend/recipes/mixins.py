@@ -1,8 +1,84 @@
-from rest_framework import mixins, viewsets, permissions
+from django.core.cache import cache
+from rest_framework import mixins, viewsets, permissions, status
+from rest_framework.response import Response
+
+from backend.middleware import TimedSerializerMixin
+from . import cache as cache_utils
 
 
 class MainViewSet(
-    mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
+    TimedSerializerMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
 ):
     pagination_class = None
     permission_classes = (permissions.AllowAny,)
+    snapshot = None
+
+    def list(self, request, *args, **kwargs):
+        if self.snapshot is None:
+            return super().list(request, *args, **kwargs)
+        return self.snapshot.response(request)
+
+
+class CachedRecipeMixin:
+    """Кеш ответов списка и детальной страницы рецептов.
+
+    Общий слой хранит ответ без пользовательских флагов, а для
+    авторизованного пользователя они подставляются поверх.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not cache_utils.is_cacheable(request):
+            return super().list(request, *args, **kwargs)
+        key = cache_utils.list_cache_key(request)
+        data = cache.get(key)
+        if data is None:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            shared = [cache_utils.with_flags(recipe)
+                      for recipe in self.get_results(data)]
+            if isinstance(data, list):
+                cache.set(key, shared, cache_utils.RESPONSE_TIMEOUT)
+            else:
+                cache.set(key, dict(data, results=shared),
+                          cache_utils.RESPONSE_TIMEOUT)
+            return response
+        results = cache_utils.overlay_user_flags(
+            request, self.get_results(data))
+        if isinstance(data, list):
+            return Response(results)
+        return Response(dict(data, results=results))
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs.get(self.lookup_field)
+        if not str(pk).isdigit():
+            return super().retrieve(request, *args, **kwargs)
+        key = cache_utils.detail_cache_key(request, pk)
+        cached = cache.get(key)
+        if cached is not None:
+            author_id, author_version, data = cached
+            current, = cache_utils.get_versions(
+                cache_utils.author_version_key(author_id))
+            if current == author_version:
+                data, = cache_utils.overlay_user_flags(request, [data])
+                return Response(data)
+        response = super().retrieve(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            author_id = response.data["author"]["id"]
+            author_version, = cache_utils.get_versions(
+                cache_utils.author_version_key(author_id))
+            cache.set(
+                key,
+                (author_id, author_version,
+                 cache_utils.with_flags(response.data)),
+                cache_utils.RESPONSE_TIMEOUT,
+            )
+        return response
+
+    @staticmethod
+    def get_results(data):
+        return data if isinstance(data, list) else data["results"]
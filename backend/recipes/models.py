@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.core import validators
 from django.db import models
+from django.db.models import BooleanField, Exists, OuterRef, Value
 from colorfield.fields import ColorField
 
 
@@ -50,11 +51,38 @@ class Ingredient(models.Model):
         verbose_name = "Ингредиент"
         verbose_name_plural = "Ингредиенты"
         ordering = ("name",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=("name", "measurement_unit"),
+                name="unique_ingredient_unit",
+            )
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    def with_related(self):
+        return self.select_related("author").prefetch_related(
+            "tags", "amount_ingredients__ingredient"
+        )
+
+    def with_user_flags(self, user):
+        """Флаги избранного и корзины текущего пользователя одним запросом"""
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef("pk"))),
+            is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+                user=user, recipe=OuterRef("pk"))),
+        )
+
+
 class Recipe(models.Model):
     """Рецепты"""
     author = models.ForeignKey(
@@ -97,6 +125,16 @@ class Recipe(models.Model):
         ],
     )
 
+    favorites_count = models.PositiveIntegerField(
+        "В избранном", default=0, editable=False,
+    )
+
+    in_carts_count = models.PositiveIntegerField(
+        "В списках покупок", default=0, editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
     class Meta:
         ordering = ('-id',)
         verbose_name = "Рецепт"
@@ -202,3 +240,75 @@ class Favorite(models.Model):
 
     def __str__(self):
         return f"{self.recipe}, {self.user}"
+
+
+class ShoppingTotal(models.Model):
+    """Итог по ингредиенту в списке покупок пользователя"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="shopping_totals",
+        verbose_name="Пользователь",
+    )
+
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name="shopping_totals",
+        verbose_name="Ингредиент",
+    )
+
+    amount = models.BigIntegerField("Общее количество")
+
+    class Meta:
+        verbose_name = "Итог списка покупок"
+        verbose_name_plural = "Итоги списков покупок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=("user", "ingredient"), name="unique_shopping_totals"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.ingredient}, {self.amount}, {self.user}"
+
+
+class TimelineEntry(models.Model):
+    """Рецепт в ленте подписчика, раскладывается при публикации"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="timeline",
+        verbose_name="Подписчик",
+    )
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries",
+        verbose_name="Рецепт",
+    )
+
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Автор",
+    )
+
+    class Meta:
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи ленты"
+        constraints = [
+            # Индекс (user, recipe) отдаёт страницу ленты одним
+            # диапазоном: user = ? AND recipe_id < ? ORDER BY recipe_id DESC
+            models.UniqueConstraint(
+                fields=("user", "recipe"), name="unique_timeline_entry"
+            )
+        ]
+        indexes = [
+            models.Index(fields=("user", "author"), name="timeline_author"),
+        ]
+
+    def __str__(self):
+        return f"{self.user}, {self.recipe}"
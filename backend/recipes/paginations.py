@@ -1,6 +1,74 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+from collections import OrderedDict
+
+from django.core.cache import cache
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+from .filters import RecipeSearchFilter
+
+COUNT_CACHE_TIMEOUT = 60
 
 
 class CustomPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = "limit"
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Курсор по -id: без OFFSET и устойчив к новым рецептам"""
+    page_size = CustomPagination.page_size
+    page_size_query_param = "limit"
+    ordering = "-id"
+
+    def get_ordering(self, request, queryset, view):
+        return (self.ordering,)
+
+    def decode_cursor(self, request):
+        if not request.query_params.get(self.cursor_query_param):
+            return None
+        return super().decode_cursor(request)
+
+
+class RecipePagination(CustomPagination):
+    """Номера страниц по умолчанию, курсор при передаче ?cursor=.
+
+    В режиме курсора count берётся из кеша и может немного отставать.
+    Поиск упорядочен по релевантности, а курсор умеет только -id, поэтому
+    с ?search= всегда используются номера страниц.
+    """
+    cursor_query_param = RecipeCursorPagination.cursor_query_param
+
+    def use_cursor(self, request):
+        search = request.query_params.get(RecipeSearchFilter.search_param)
+        return (self.cursor_query_param in request.query_params
+                and not (search and search.strip()))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_pagination = None
+        if not self.use_cursor(request):
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_pagination = RecipeCursorPagination()
+        self.count = self.get_cached_count(queryset)
+        return self.cursor_pagination.paginate_queryset(
+            queryset, request, view)
+
+    @staticmethod
+    def get_cached_count(queryset):
+        query = str(queryset.query).encode()
+        key = f"recipes-count:{hashlib.md5(query).hexdigest()}"
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, COUNT_CACHE_TIMEOUT)
+        return count
+
+    def get_paginated_response(self, data):
+        if self.cursor_pagination is None:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ("count", self.count),
+            ("next", self.cursor_pagination.get_next_link()),
+            ("previous", self.cursor_pagination.get_previous_link()),
+            ("results", data),
+        ]))
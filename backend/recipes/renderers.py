@@ -0,0 +1,32 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class ShoppingCartRenderer(BaseRenderer):
+    """Форматы выгрузки списка покупок.
+
+    Сам файл отдаёт представление потоком, рендерер нужен для выбора
+    формата по ?format= и для сообщений об ошибках.
+    """
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+class ShoppingCartTextRenderer(ShoppingCartRenderer):
+    media_type = "text/plain"
+    format = "txt"
+
+
+class ShoppingCartCSVRenderer(ShoppingCartRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class ShoppingCartJSONRenderer(ShoppingCartRenderer):
+    media_type = "application/json"
+    format = "json"
@@ -0,0 +1,130 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "recipes_recipe_fts"
+WORD = re.compile(r"\w+")
+# Окончания для упрощённого стемминга запроса в SQLite, длинные первыми
+ENDINGS = sorted((
+    "иями", "ями", "ами", "ией", "иях", "ого", "его", "ому", "ему", "ыми",
+    "ими", "ая", "яя", "ое", "ее", "ые", "ие", "ый", "ий", "ой", "ей", "ую",
+    "юю", "ом", "ем", "ах", "ях", "ов", "ев", "ам", "ям", "ью", "ия", "ья",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+), key=len, reverse=True)
+MIN_STEM = 3
+
+POSTGRES_SETUP = (
+    "ALTER TABLE recipes_recipe ADD COLUMN IF NOT EXISTS search_vector "
+    "tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(text, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS recipes_recipe_search_gin "
+    "ON recipes_recipe USING gin (search_vector)",
+)
+
+
+def normalize(text):
+    return (text or "").lower().replace("ё", "е")
+
+
+def stem(word):
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def fts_query(query):
+    """Строка MATCH для FTS5: основы слов с поиском по префиксу"""
+    return " ".join(
+        f'"{stem(word)}"*' for word in WORD.findall(normalize(query))
+    )
+
+
+def setup_search_index(using_connection=connection):
+    """Создаёт полнотекстовый индекс для текущей СУБД, если его нет"""
+    with using_connection.cursor() as cursor:
+        if using_connection.vendor == "postgresql":
+            for sql in POSTGRES_SETUP:
+                cursor.execute(sql)
+        elif using_connection.vendor == "sqlite":
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+            if cursor.fetchone():
+                return
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                "name, text, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+            rebuild_search_index(using_connection)
+
+
+def rebuild_search_index(using_connection=connection):
+    if using_connection.vendor != "sqlite":
+        return
+    from .models import Recipe
+    with using_connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, text) VALUES (%s, %s, %s)",
+            [
+                (pk, normalize(name), normalize(text))
+                for pk, name, text in Recipe.objects.using(
+                    using_connection.alias).values_list("pk", "name", "text")
+                .iterator()
+            ],
+        )
+
+
+def index_recipe(recipe):
+    """В PostgreSQL вектор считает сама база, в SQLite пишем в FTS5"""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+                       [recipe.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, text) VALUES (%s, %s, %s)",
+            [recipe.pk, normalize(recipe.name), normalize(recipe.text)],
+        )
+
+
+def unindex_recipe(recipe_id):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+                       [recipe_id])
+
+
+def search_recipes(queryset, query):
+    """Фильтрует рецепты по запросу и сортирует по релевантности"""
+    if connection.vendor == "postgresql":
+        tsquery = "websearch_to_tsquery('russian', %s)"
+        return queryset.annotate(
+            search_match=RawSQL(
+                f"recipes_recipe.search_vector @@ {tsquery}", [query],
+                output_field=BooleanField()),
+            search_rank=RawSQL(
+                f"ts_rank_cd(recipes_recipe.search_vector, {tsquery})",
+                [query], output_field=FloatField()),
+        ).filter(search_match=True).order_by("-search_rank", "-id")
+    if connection.vendor == "sqlite":
+        match = fts_query(query)
+        if not match:
+            return queryset
+        return queryset.annotate(
+            search_match=RawSQL(
+                f"recipes_recipe.id IN (SELECT rowid FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s)",
+                [match], output_field=BooleanField()),
+            search_rank=RawSQL(
+                f"(SELECT -bm25({FTS_TABLE}, 2.0, 1.0) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s "
+                f"AND {FTS_TABLE}.rowid = recipes_recipe.id)",
+                [match], output_field=FloatField()),
+        ).filter(search_match=True).order_by("-search_rank", "-id")
+    return queryset.filter(
+        Q(name__icontains=query) | Q(text__icontains=query))
@@ -1,8 +1,14 @@
+import json
+
+from django.db import transaction
 from django.shortcuts import get_object_or_404
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
 
+from .cache import render_recipes
+from .fields import ImageSrcsetField, RecipeImageField
+from .images import store_recipe_image
+from .shopping import refresh_recipe
 from .models import (
     Recipe,
     Tag,
@@ -15,12 +21,15 @@ from user.serializers import CustomUserSerializer
 
 
 class ShowRecipeSerializers(serializers.ModelSerializer):
+    image_srcset = ImageSrcsetField()
+
     class Meta:
         model = Recipe
         fields = (
             "id",
             "name",
             "image",
+            "image_srcset",
             "cooking_time",
         )
 
@@ -64,9 +73,7 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
 
 
 class CreateIngredientInRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(), many=False
-    )
+    id = serializers.IntegerField()
 
     amount = serializers.IntegerField()
 
@@ -78,6 +85,11 @@ class CreateIngredientInRecipeSerializer(serializers.ModelSerializer):
         )
 
 
+class RecipeListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        return render_recipes(self.child, list(data))
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(required=False, read_only=True)
     ingredients = IngredientInRecipeSerializer(
@@ -91,6 +103,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_srcset = ImageSrcsetField()
 
     class Meta:
         model = Recipe
@@ -99,6 +112,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             "author",
             "name",
             "image",
+            "image_srcset",
             "text",
             "ingredients",
             "tags",
@@ -106,12 +120,25 @@ class RecipeSerializer(serializers.ModelSerializer):
             "is_favorited",
             "is_in_shopping_cart",
         )
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, instance):
+        data, = render_recipes(self, [instance])
+        return data
+
+    def render_fragment(self, instance):
+        """Общая для всех пользователей часть, без кеша"""
+        return super().to_representation(instance)
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, "is_favorited"):
+            return obj.is_favorited
         user = self.context["request"].user.id
         return obj.favorites_lists.filter(user=user).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, "is_in_shopping_cart"):
+            return obj.is_in_shopping_cart
         user = self.context["request"].user.id
         return obj.shopping_lists.filter(user=user).exists()
 
@@ -124,7 +151,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     )
     tags = serializers.PrimaryKeyRelatedField(queryset=Tag.objects.all(),
                                               many=True)
-    image = Base64ImageField()
+    image = RecipeImageField()
 
     class Meta:
         model = Recipe
@@ -137,6 +164,26 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             "image",
         )
 
+    def to_internal_value(self, data):
+        if hasattr(data, "getlist"):
+            data = self.from_form_data(data)
+        return super().to_internal_value(data)
+
+    @staticmethod
+    def from_form_data(data):
+        """multipart/form-data: теги списком, ингредиенты строкой JSON"""
+        result = data.dict()
+        if "tags" in data:
+            result["tags"] = data.getlist("tags")
+        ingredients = result.get("ingredients")
+        if isinstance(ingredients, str):
+            try:
+                result["ingredients"] = json.loads(ingredients)
+            except ValueError:
+                raise serializers.ValidationError(
+                    {"ingredients": "Ожидается список ингредиентов в JSON"})
+        return result
+
     def validate_cooking_time(self, cooking_time):
         if cooking_time <= 0:
             raise serializers.ValidationError(
@@ -159,55 +206,91 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 "Нет ингредиентов - нельзя добавить пустой рецепт!"
             )
-        if len(ingredients) != len(set(ingredients)):
+        ids = {ingredient["id"] for ingredient in ingredients}
+        if len(ingredients) != len(ids):
             raise serializers.ValidationError(
                 "Все ингредиенты должны быть уникальными."
             )
+        missing = ids - set(
+            Ingredient.objects.filter(id__in=ids).values_list("id", flat=True)
+        )
+        if missing:
+            raise serializers.ValidationError(
+                f"Ингредиенты не найдены: {sorted(missing)}"
+            )
         return ingredients
 
     @staticmethod
     def add_ingredients(ingredients, recipe):
-        ingredients_liist = []
-        for ingredient in ingredients:
-            ingredient_obj = Ingredient.objects.get(id=ingredient["id"].id)
-            ingredients_liist.append(
-                IngredientInRecipe.objects.update_or_create(
-                    recipe=recipe,
-                    ingredient=ingredient_obj,
-                    amount=ingredient["amount"],
-                )
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe,
+                ingredient_id=ingredient["id"],
+                amount=ingredient["amount"],
             )
+            for ingredient in ingredients
+        )
 
-    def add_tags_ingredients(self, ingredients, tags, model):
-        for ingredient in ingredients:
-            IngredientInRecipe.objects.update_or_create(
-                recipe=model, ingredient=ingredient.id,
-                amount=ingredient.amount
+    @staticmethod
+    def update_ingredients(ingredients, recipe):
+        """Применяет только разницу между старым и новым составом"""
+        amounts = {
+            ingredient["id"]: ingredient["amount"]
+            for ingredient in ingredients
+        }
+        existing = {
+            row.ingredient_id: row for row in recipe.amount_ingredients.all()
+        }
+        removed = existing.keys() - amounts.keys()
+        if removed:
+            recipe.amount_ingredients.filter(
+                ingredient_id__in=removed).delete()
+        changed = []
+        for ingredient_id, row in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ("amount",))
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=amount,
             )
-        model.tags.set(tags)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing
+        )
+        refresh_recipe(recipe.pk, set(existing) | set(amounts))
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop("amount_ingredients")
         tags = validated_data.pop("tags")
+        validated_data["image"] = store_recipe_image(validated_data["image"])
         recipe = Recipe.objects.create(**validated_data)
         self.add_ingredients(ingredients, recipe)
         recipe.tags.set(tags)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.tags.clear()
-        instance.ingredients.clear()
+        if "image" in validated_data:
+            validated_data["image"] = store_recipe_image(
+                validated_data["image"])
         instance.tags.set(validated_data.pop("tags"))
-        self.add_ingredients(
+        self.update_ingredients(
             validated_data.pop("amount_ingredients"),
             instance,
         )
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
-        return RecipeSerializer(
-            instance, context={"request": self.context.get("request")}
-        ).data
+        request = self.context.get("request")
+        instance = Recipe.objects.with_user_flags(
+            request.user).get(pk=instance.pk)
+        return RecipeSerializer(instance, context={"request": request}).data
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
@@ -254,3 +337,19 @@ class ShoppingListSerializer(FavoriteSerializer):
             raise serializers.ValidationError(
                 {"errors": "Рецепт уже добавлен"})
         return data
+
+
+class BulkRecipesSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=500,
+    )
+
+
+class ShoppingTotalSerializer(serializers.Serializer):
+    id = serializers.IntegerField(source="ingredient_id")
+    name = serializers.CharField(source="ingredient__name")
+    measurement_unit = serializers.CharField(
+        source="ingredient__measurement_unit")
+    amount = serializers.IntegerField(source="amount__sum")
@@ -0,0 +1,77 @@
+from django.db import transaction
+from django.db.models import F, Sum
+
+from user.utils import lock_users
+from .models import IngredientInRecipe, ShoppingList, ShoppingTotal
+
+
+def refresh_totals(user_ids, ingredient_ids=None):
+    """Пересчитывает итоги только для затронутых пар
+    (пользователь, ингредиент) по содержимому их корзин.
+
+    Пересчёты одного пользователя идут по очереди: иначе два параллельных
+    удаления и вставки сталкиваются на уникальном индексе.
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids or ingredient_ids is not None and not ingredient_ids:
+        return
+    with transaction.atomic():
+        lock_users(user_ids)
+        replace_totals(user_ids, ingredient_ids)
+
+
+def replace_totals(user_ids, ingredient_ids):
+    totals = ShoppingTotal.objects.filter(user_id__in=user_ids)
+    rows = IngredientInRecipe.objects.filter(
+        recipe__shopping_lists__user_id__in=user_ids)
+    if ingredient_ids is not None:
+        totals = totals.filter(ingredient_id__in=ingredient_ids)
+        rows = rows.filter(ingredient_id__in=ingredient_ids)
+    totals.delete()
+    ShoppingTotal.objects.bulk_create(
+        ShoppingTotal(
+            user_id=row["recipe__shopping_lists__user_id"],
+            ingredient_id=row["ingredient_id"],
+            amount=row["total"],
+        )
+        for row in rows.values(
+            "recipe__shopping_lists__user_id", "ingredient_id",
+        ).annotate(total=Sum("amount")).order_by()
+    )
+
+
+def recipe_ingredient_ids(recipe_ids):
+    return set(
+        IngredientInRecipe.objects.filter(recipe_id__in=recipe_ids)
+        .values_list("ingredient_id", flat=True)
+    )
+
+
+def cart_user_ids(recipe_id):
+    return set(
+        ShoppingList.objects.filter(recipe_id=recipe_id)
+        .values_list("user_id", flat=True)
+    )
+
+
+def refresh_cart(user_id, recipe_ids):
+    """Рецепты добавлены в корзину пользователя или убраны из неё"""
+    refresh_totals([user_id], recipe_ingredient_ids(recipe_ids))
+
+
+def refresh_recipe(recipe_id, ingredient_ids):
+    """Изменился состав рецепта, который лежит в чьих-то корзинах"""
+    refresh_totals(cart_user_ids(recipe_id), ingredient_ids)
+
+
+def shopping_totals(user):
+    return (
+        ShoppingTotal.objects.filter(user=user)
+        .values(
+            "ingredient_id",
+            "ingredient__name",
+            "ingredient__measurement_unit",
+            amount__sum=F("amount"),
+        )
+        .order_by("ingredient__name", "ingredient__measurement_unit")
+    )
@@ -0,0 +1,104 @@
+from django.db import connections
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from user.counters import decrement, increment
+from .feed import fan_out
+from .cache import (
+    INGREDIENTS_VERSION_KEY,
+    TAGS_VERSION_KEY,
+    invalidate_author,
+    invalidate_catalog,
+    invalidate_recipe,
+)
+from .search import index_recipe, setup_search_index, unindex_recipe
+from .shopping import (
+    cart_user_ids,
+    recipe_ingredient_ids,
+    refresh_cart,
+    refresh_totals,
+)
+from .models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    ShoppingList,
+    Tag,
+    User,
+)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    invalidate_catalog(INGREDIENTS_VERSION_KEY)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    invalidate_catalog(TAGS_VERSION_KEY)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    invalidate_recipe(instance.pk, instance.author_id)
+    index_recipe(instance)
+    if created:
+        increment(User.objects.filter(pk=instance.author_id),
+                  "recipes_count")
+        fan_out(instance)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    # Пока строки рецепта на месте, запоминаем, чьи итоги пересчитать
+    instance._cart_users = cart_user_ids(instance.pk)
+    instance._cart_ingredients = recipe_ingredient_ids([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    invalidate_recipe(instance.pk, instance.author_id)
+    unindex_recipe(instance.pk)
+    refresh_totals(getattr(instance, "_cart_users", ()),
+                   getattr(instance, "_cart_ingredients", None))
+    decrement(User.objects.filter(pk=instance.author_id), "recipes_count")
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        increment(Recipe.objects.filter(pk=instance.recipe_id),
+                  "favorites_count")
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    decrement(Recipe.objects.filter(pk=instance.recipe_id),
+              "favorites_count")
+
+
+@receiver(post_save, sender=ShoppingList)
+def shopping_list_created(sender, instance, created, **kwargs):
+    if created:
+        increment(Recipe.objects.filter(pk=instance.recipe_id),
+                  "in_carts_count")
+        refresh_cart(instance.user_id, [instance.recipe_id])
+
+
+@receiver(post_delete, sender=ShoppingList)
+def shopping_list_deleted(sender, instance, **kwargs):
+    decrement(Recipe.objects.filter(pk=instance.recipe_id), "in_carts_count")
+    refresh_cart(instance.user_id, [instance.recipe_id])
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields == frozenset(("last_login",)):
+        return
+    invalidate_author(instance.pk)
+
+
+def create_search_index(sender, using, **kwargs):
+    setup_search_index(connections[using])
@@ -0,0 +1,89 @@
+import gzip
+import hashlib
+import threading
+
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from .cache import INGREDIENTS_VERSION_KEY, TAGS_VERSION_KEY, get_versions
+from .models import Ingredient, Tag
+from .serializers import IngredientSerializer, TagSerializer
+
+
+def accepts_gzip(header):
+    """Разрешает ли Accept-Encoding ответ в gzip с учётом q=0"""
+    weights = {}
+    for item in header.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding.lower()] = weight
+    return weights.get("gzip", weights.get("*", 0.0)) > 0
+
+
+class Snapshot:
+    """Заранее отрендеренный JSON справочника и его gzip-копия.
+
+    Собирается при первом обращении и пересобирается, когда версия
+    справочника в общем кеше отличается от версии снимка: так изменение
+    в одном воркере доходит до всех остальных.
+    """
+
+    def __init__(self, queryset, serializer_class, version_key):
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+        self.version_key = version_key
+        self._data = None
+        self._lock = threading.Lock()
+
+    def build(self):
+        body = JSONRenderer().render(
+            self.serializer_class(self.queryset.all(), many=True).data
+        )
+        digest = hashlib.sha1(body).hexdigest()
+        # Сильный валидатор у каждого варианта свой: байты разные
+        return (
+            body, f'"{digest}"',
+            gzip.compress(body, mtime=0), f'"{digest}-gzip"',
+        )
+
+    def get(self):
+        # Версию читаем до сборки: правка во время сборки даст лишнюю
+        # пересборку, а не устаревший снимок
+        version, = get_versions(self.version_key)
+        data = self._data
+        if data is None or data[0] != version:
+            with self._lock:
+                if self._data is None or self._data[0] != version:
+                    self._data = (version, *self.build())
+                data = self._data
+        return data[1:]
+
+    def response(self, request):
+        body, etag, gzipped, gzip_etag = self.get()
+        compressed = accepts_gzip(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if compressed:
+            body, etag = gzipped, gzip_etag
+        if etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+            response = HttpResponse(status=304)
+        else:
+            response = HttpResponse(body, content_type="application/json")
+            if compressed:
+                response["Content-Encoding"] = "gzip"
+        response["ETag"] = etag
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+
+tags_snapshot = Snapshot(Tag.objects.all(), TagSerializer, TAGS_VERSION_KEY)
+ingredients_snapshot = Snapshot(
+    Ingredient.objects.all(), IngredientSerializer, INGREDIENTS_VERSION_KEY)
@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.test import APITransactionTestCase
+
+from .models import Ingredient, IngredientInRecipe, Recipe, Tag
+
+User = get_user_model()
+
+
+class ResponseCacheInvalidationTest(APITransactionTestCase):
+    """Сброс версий идёт в on_commit, поэтому тест транзакционный"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username="author", email="author@example.com",
+            first_name="author", last_name="author",
+            password="secret-password",
+        )
+        self.tag = Tag.objects.create(
+            name="breakfast", color="#CC5500", slug="breakfast")
+        self.ingredient = Ingredient.objects.create(
+            name="flour", measurement_unit="g")
+        self.recipe = Recipe.objects.create(
+            author=self.author, name="pancakes", text="text",
+            cooking_time=5, image="recipes/image.png")
+        self.recipe.tags.set([self.tag])
+        IngredientInRecipe.objects.create(
+            recipe=self.recipe, ingredient=self.ingredient, amount=100)
+        self.urls = (
+            "/api/recipes/",
+            f"/api/recipes/?author={self.author.pk}",
+            f"/api/recipes/{self.recipe.pk}/",
+        )
+
+    def get_recipe(self, url):
+        data = self.client.get(url).data
+        return data["results"][0] if "results" in data else data
+
+    def test_tag_rename_reaches_cached_responses(self):
+        for url in self.urls:
+            self.get_recipe(url)
+        self.tag.name = "brunch"
+        self.tag.save()
+        for url in self.urls:
+            with self.subTest(url=url):
+                tags = self.get_recipe(url)["tags"]
+                self.assertEqual(tags[0]["name"], "brunch")
+
+    def test_ingredient_rename_reaches_cached_responses(self):
+        for url in self.urls:
+            self.get_recipe(url)
+        self.ingredient.name = "rye flour"
+        self.ingredient.save()
+        for url in self.urls:
+            with self.subTest(url=url):
+                ingredients = self.get_recipe(url)["ingredients"]
+                self.assertEqual(ingredients[0]["name"], "rye flour")
+
+    def test_recipe_edit_reaches_cached_responses(self):
+        for url in self.urls:
+            self.get_recipe(url)
+        self.recipe.name = "waffles"
+        self.recipe.save()
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.get_recipe(url)["name"], "waffles")
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    SkipFile,
+    TemporaryFileUploadHandler,
+)
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Пишет файл из multipart сразу на диск и бросает слишком большие.
+
+    Имена брошенных полей остаются в request.oversized_files, чтобы
+    сериализатор ответил про размер, а не про отсутствующий файл.
+    """
+
+    def new_file(self, *args, **kwargs):
+        self.received = 0
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.file.close()
+            if not hasattr(self.request, "oversized_files"):
+                self.request.oversized_files = set()
+            self.request.oversized_files.add(self.field_name)
+            raise SkipFile()
+        return super().receive_data_chunk(raw_data, start)
@@ -1,8 +1,53 @@
+import csv
+import hashlib
+import json
+
+
 def table_recipes(ingredients):
-    str_ing = "Ингредиенты |  Количество | Единицы измерения \n\n"
-    str_ing += "________________________________________________"
+    yield "Ингредиенты |  Количество | Единицы измерения \n\n"
+    yield "________________________________________________"
     for i in ingredients:
-        str_ing += f"\n{i['ingredient__name']} | " \
-                   f"{i['amount__sum']} | " \
-                   f"{i['ingredient__measurement_unit']} \n"
-    return str_ing
+        yield f"\n{i['ingredient__name']} | " \
+              f"{i['amount__sum']} | " \
+              f"{i['ingredient__measurement_unit']} \n"
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def csv_recipes(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(("name", "amount", "measurement_unit"))
+    for i in ingredients:
+        yield writer.writerow((
+            i["ingredient__name"],
+            i["amount__sum"],
+            i["ingredient__measurement_unit"],
+        ))
+
+
+def json_recipes(ingredients):
+    yield "["
+    for number, i in enumerate(ingredients):
+        yield ("," if number else "") + json.dumps({
+            "name": i["ingredient__name"],
+            "amount": i["amount__sum"],
+            "measurement_unit": i["ingredient__measurement_unit"],
+        }, ensure_ascii=False)
+    yield "]"
+
+
+def ingredients_etag(ingredients):
+    checksum = hashlib.md5()
+    for chunk in json_recipes(ingredients):
+        checksum.update(chunk.encode())
+    return f'"{checksum.hexdigest()}"'
+
+
+EXPORTS = {
+    "txt": table_recipes,
+    "csv": csv_recipes,
+    "json": json_recipes,
+}
@@ -1,4 +1,3 @@
-from django.db.models import Sum
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
 from rest_framework import status
@@ -8,22 +7,37 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.http import HttpResponse
+from rest_framework.utils.urls import replace_query_param
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework.viewsets import ModelViewSet
 
-from .utils import table_recipes
-from .paginations import CustomPagination
-from .filters import IngredientFilter, RecipeFilter
-from .mixins import MainViewSet
+from backend.middleware import TimedSerializerMixin, timed_serializer
+
+from .renderers import (
+    ShoppingCartCSVRenderer,
+    ShoppingCartJSONRenderer,
+    ShoppingCartTextRenderer,
+)
+from .feed import feed_ids
+from .shopping import shopping_totals
+from .utils import EXPORTS, ingredients_etag
+from .paginations import RecipePagination
+from .bulk import bulk_add, bulk_remove, user_lists_locked
+from .filters import RecipeFilter, RecipeSearchFilter
+from .ingredient_index import get_ingredient_index
+from .snapshots import ingredients_snapshot, tags_snapshot
+from .uploadhandlers import LimitedTemporaryFileUploadHandler
+from .mixins import CachedRecipeMixin, MainViewSet
 from .models import (
     Ingredient,
     Tag,
     Recipe,
     Favorite,
-    IngredientInRecipe,
     ShoppingList,
 )
 from .serializers import (
+    BulkRecipesSerializer,
+    ShoppingTotalSerializer,
     TagSerializer,
     IngredientSerializer,
     RecipeCreateSerializer,
@@ -38,22 +52,43 @@ User = get_user_model()
 class TagsViewSet(MainViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    snapshot = tags_snapshot
 
 
 class IngredientsViewSet(MainViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (IngredientFilter,)
-    search_fields = ("name",)
+    snapshot = ingredients_snapshot
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get("name")
+        if name:
+            return Response(get_ingredient_index().search(name))
+        return super().list(request, *args, **kwargs)
 
-class RecipeViewSet(ModelViewSet):
+
+class RecipeViewSet(CachedRecipeMixin, TimedSerializerMixin, ModelViewSet):
     queryset = Recipe.objects.select_related(
         'author').prefetch_related('tags', 'amount_ingredients').all()
-    pagination_class = CustomPagination
+    pagination_class = RecipePagination
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filter_backends = [
+        DjangoFilterBackend, RecipeSearchFilter, OrderingFilter]
     filterset_class = RecipeFilter
+    # Класс маршрута для STATEMENT_TIMEOUTS, задаётся в @action
+    statement_timeout = None
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [LimitedTemporaryFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def get_queryset(self):
+        queryset = Recipe.objects.with_user_flags(self.request.user)
+        if self.action in ("list", "retrieve"):
+            # Связанные данные догружаются только для рецептов,
+            # которых нет в кеше фрагментов
+            return queryset
+        return queryset.with_related()
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -108,14 +143,18 @@ class RecipeViewSet(ModelViewSet):
                 },
                 context={"request": request},
             )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
+            # Та же блокировка, что и у массовых операций: проверка
+            # уникальности и вставка не перемежаются с ними
+            with user_lists_locked(request.user):
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         if request.method == "DELETE":
             recipe = get_object_or_404(Recipe, id=pk)
-            get_object_or_404(Favorite,
-                              user=request.user,
-                              recipe=recipe).delete()
+            with user_lists_locked(request.user):
+                get_object_or_404(Favorite,
+                                  user=request.user,
+                                  recipe=recipe).delete()
             return Response(
                 {"detail": "Рецепт из избранного удален."},
                 status=status.HTTP_204_NO_CONTENT,
@@ -135,33 +174,118 @@ class RecipeViewSet(ModelViewSet):
                 },
                 context={"request": request},
             )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
+            # Та же блокировка, что и у массовых операций: проверка
+            # уникальности и вставка не перемежаются с ними
+            with user_lists_locked(request.user):
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         if request.method == "DELETE":
             recipe = get_object_or_404(Recipe, id=pk)
-            get_object_or_404(ShoppingList,
-                              user=request.user,
-                              recipe=recipe).delete()
+            with user_lists_locked(request.user):
+                get_object_or_404(ShoppingList,
+                                  user=request.user,
+                                  recipe=recipe).delete()
             return Response(
                 {"detail": "Рецепт из избранного удален."},
                 status=status.HTTP_204_NO_CONTENT,
             )
 
-    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def bulk_recipes(self, model, request):
+        serializer = BulkRecipesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data["recipes"]))
+        if request.method == "POST":
+            outcomes = bulk_add(model, request.user, ids)
+        else:
+            outcomes = bulk_remove(model, request.user, ids)
+        return Response({"results": [
+            {"id": recipe_id, "status": outcome}
+            for recipe_id, outcome in outcomes.items()
+        ]})
+
+    @action(
+        detail=False,
+        methods=["POST", "DELETE"],
+        url_path="favorite",
+        url_name="favorite-bulk",
+        permission_classes=(IsAuthenticated,),
+    )
+    def favorite_bulk(self, request):
+        return self.bulk_recipes(Favorite, request)
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        permission_classes=(IsAuthenticated,),
+    )
+    def feed(self, request):
+        """Рецепты авторов из подписок, новые сверху.
+
+        Постраничный вывод по ключу: ?before=<id последнего рецепта>.
+        """
+        before = request.query_params.get("before", "")
+        limit = request.query_params.get("limit", "")
+        limit = int(limit) if limit.isdigit() else self.paginator.page_size
+        ids, has_more = feed_ids(
+            request.user,
+            int(before) if before.isdigit() else None,
+            min(max(limit, 1), 100),
+        )
+        recipes = Recipe.objects.with_user_flags(request.user).in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True)
+        next_link = None
+        if has_more:
+            next_link = replace_query_param(
+                request.build_absolute_uri(), "before", ids[-1])
+        return Response({"next": next_link, "results": serializer.data})
+
+    @action(
+        detail=False,
+        methods=["GET", "POST", "DELETE"],
+        url_path="shopping_cart",
+        url_name="shopping-cart-bulk",
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_bulk(self, request):
+        if request.method == "GET":
+            return Response(timed_serializer(ShoppingTotalSerializer(
+                shopping_totals(request.user), many=True)).data)
+        return self.bulk_recipes(ShoppingList, request)
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(
+            ShoppingCartTextRenderer,
+            ShoppingCartCSVRenderer,
+            ShoppingCartJSONRenderer,
+        ),
+        statement_timeout="export",
+    )
     def download_shopping_cart(self, request):
         user = request.user
         if not user.shopping_lists.exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        filename = "ingredients.txt"
-        ingredients = (
-            IngredientInRecipe.objects
-            .filter(recipe__shopping_lists__user=user.id)
-            .values("ingredient__name", "ingredient__measurement_unit")
-            .annotate(Sum("amount"))
+        renderer = request.accepted_renderer
+        filename = f"ingredients.{renderer.format}"
+        ingredients = shopping_totals(user)
+        if renderer.format == "json":
+            ingredients = list(ingredients)
+            etag = ingredients_etag(ingredients)
+            if request.META.get("HTTP_IF_NONE_MATCH") == etag:
+                response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+                response["ETag"] = etag
+                return response
+        else:
+            ingredients = ingredients.iterator()
+            etag = None
+        response = StreamingHttpResponse(
+            EXPORTS[renderer.format](ingredients),
+            content_type=f"{renderer.media_type}; charset=utf-8",
         )
-        table = table_recipes(ingredients)
-        response = HttpResponse(content_type="text/plain")
         response["Content-Disposition"] = f"attachment; filename={filename}"
-        response.write(table)
+        if etag:
+            response["ETag"] = etag
         return response
@@ -16,6 +16,8 @@ class UserAdmin(admin.ModelAdmin):
         "last_name",
         "password",
         "date_joined",
+        "recipes_count",
+        "followers_count",
     )
     list_filter = ("email", "first_name")
     empty_value_display = "--None--"
@@ -5,3 +5,6 @@ class UserConfig(AppConfig):
     name = "user"
     verbose_name = "Пользователи"
     default_auto_field = "django.db.models.BigAutoField"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,103 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import SAFE_METHODS
+
+
+class LRUCache:
+    """Ограниченный по размеру кеш в памяти процесса со сроком жизни"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = (time.monotonic() + self.ttl, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+
+local_tokens = LRUCache(
+    settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_LOCAL_TTL)
+
+
+def token_digest(key):
+    # Сам токен в ключи общего кеша не попадает
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def shared_key(digest):
+    return f"auth:token:{digest}"
+
+
+def forget_tokens(keys):
+    """Сбрасывает токены при выходе, смене пароля и деактивации.
+
+    Другие процессы держат токен только в своём LRU и перестанут его
+    принимать не позже чем через AUTH_TOKEN_LOCAL_TTL секунд.
+    """
+    digests = [token_digest(key) for key in keys]
+    for digest in digests:
+        local_tokens.discard(digest)
+    if settings.SHARED_CACHE:
+        cache.delete_many([shared_key(digest) for digest in digests])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к базе для известных токенов.
+
+    Пара (пользователь, токен) ищется в LRU процесса, затем в общем кеше
+    и только потом в базе. Кеш в памяти процесса (LocMemCache) общим не
+    считается: сброс в нём не дошёл бы до других воркеров, поэтому
+    с ним используется только короткоживущий LRU.
+
+    Пишущие запросы читают пользователя из базы: представление может
+    сохранить request.user, и устаревшая копия затёрла бы свежие данные.
+    """
+    fresh = False
+
+    def authenticate(self, request):
+        self.fresh = request.method not in SAFE_METHODS
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        digest = token_digest(key)
+        cached = None if self.fresh else local_tokens.get(digest)
+        if cached is None:
+            if settings.SHARED_CACHE and not self.fresh:
+                cached = cache.get(shared_key(digest))
+            if cached is None:
+                cached = super().authenticate_credentials(key)
+                if settings.SHARED_CACHE:
+                    cache.set(shared_key(digest), cached,
+                              settings.AUTH_TOKEN_SHARED_TTL)
+            local_tokens.set(digest, cached)
+        user, token = cached
+        # Представления меняют request.user, общий объект трогать нельзя
+        return copy.deepcopy(user), token
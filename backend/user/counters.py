@@ -0,0 +1,9 @@
+from django.db.models import F
+
+
+def increment(queryset, field):
+    queryset.update(**{field: F(field) + 1})
+
+
+def decrement(queryset, field):
+    queryset.filter(**{f"{field}__gt": 0}).update(**{field: F(field) - 1})
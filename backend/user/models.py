@@ -3,7 +3,14 @@ from django.db import models
 
 
 class User(AbstractUser):
-    """Пользователи"""
+    """Пользователи.
+
+    Счётчики меняются только запросами UPDATE с F(), поэтому save()
+    пишет их, лишь если они явно названы в update_fields: иначе старая
+    копия пользователя вернула бы прежние значения.
+    """
+    COUNTER_FIELDS = ("recipes_count", "followers_count")
+
     email = models.EmailField(
         "Электронная почта",
         max_length=254,
@@ -25,6 +32,14 @@ class User(AbstractUser):
         max_length=150,
     )
 
+    recipes_count = models.PositiveIntegerField(
+        "Количество рецептов", default=0, editable=False,
+    )
+
+    followers_count = models.PositiveIntegerField(
+        "Количество подписчиков", default=0, editable=False,
+    )
+
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = [
         "username",
@@ -39,6 +54,16 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not kwargs.get("force_insert")
+                and kwargs.get("update_fields") is None):
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Subscription(models.Model):
     """Подписки"""
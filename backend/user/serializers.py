@@ -4,7 +4,9 @@ from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
 
 from .models import Subscription
+from .utils import get_following_ids
 
+from recipes.fields import ImageSrcsetField
 from recipes.models import Recipe
 
 
@@ -12,12 +14,15 @@ User = get_user_model()
 
 
 class ShowRecipeSerializers(serializers.ModelSerializer):
+    image_srcset = ImageSrcsetField()
+
     class Meta:
         model = Recipe
         fields = (
             "id",
             "name",
             "image",
+            "image_srcset",
             "cooking_time",
         )
 
@@ -42,10 +47,7 @@ class CustomUserSerializer(UserSerializer):
         user = self.context["request"].user
         if user.is_anonymous:
             return False
-        return Subscription.objects.filter(
-            user=user.id,
-            following=obj.id,
-        ).exists()
+        return obj.id in get_following_ids(self.context["request"])
 
     def validate_username(self, username):
         if username == 'me':
@@ -71,7 +73,7 @@ class CustomUserSerializer(UserSerializer):
 
 class SubscriptionShowSerializers(CustomUserSerializer):
     recipes = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.SerializerMethodField(read_only=True)
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(CustomUserSerializer.Meta):
         fields = CustomUserSerializer.Meta.fields + (
@@ -79,15 +81,15 @@ class SubscriptionShowSerializers(CustomUserSerializer):
             "recipes_count",
         )
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
     def get_recipes(self, obj):
         request = self.context.get("request")
-        limit = request.query_params.get("recipes_limit")
-        recipes = Recipe.objects.filter(author=obj).all()
-        if limit:
-            recipes = recipes[:(int(limit))]
+        if hasattr(obj, "preview_recipes"):
+            recipes = obj.preview_recipes
+        else:
+            limit = request.query_params.get("recipes_limit")
+            recipes = Recipe.objects.filter(author=obj).all()
+            if limit:
+                recipes = recipes[:(int(limit))]
         srs = ShowRecipeSerializers(recipes, many=True,
                                     context={"request": request})
         return srs.data
@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.feed import backfill, unfollow
+from .authentication import forget_tokens
+from .counters import decrement, increment
+from .models import Subscription
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        increment(User.objects.filter(pk=instance.following_id),
+                  "followers_count")
+        # Лента выбирает между раскладкой и чтением при запросе по
+        # счётчику, поэтому заполняется после его обновления
+        backfill(instance.user_id, instance.following_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    decrement(User.objects.filter(pk=instance.following_id),
+              "followers_count")
+    unfollow(instance.user_id, instance.following_id)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: forget_tokens([instance.key]))
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields, **kwargs):
+    # Смена пароля и деактивация сохраняют пользователя, вход меняет
+    # только last_login
+    if created or update_fields == frozenset(("last_login",)):
+        return
+    keys = list(Token.objects.filter(
+        user_id=instance.pk).values_list("key", flat=True))
+    if keys:
+        transaction.on_commit(lambda: forget_tokens(keys))
@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from recipes.models import Recipe
+from .authentication import local_tokens
+from .models import Subscription
+
+User = get_user_model()
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username,
+        email=f"{username}@example.com",
+        first_name=username,
+        last_name=username,
+        password="secret-password",
+    )
+
+
+class SubscriptionsQueriesTest(APITestCase):
+    url = "/api/users/subscriptions/?recipes_limit=2"
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user("reader")
+        self.client.force_authenticate(self.user)
+
+    def follow(self, count):
+        for number in range(count):
+            author = create_user(
+                f"author{Subscription.objects.count()}_{number}")
+            Recipe.objects.bulk_create(
+                Recipe(author=author, name=f"recipe {index}", text="text",
+                       cooking_time=5, image="recipes/image.png")
+                for index in range(3)
+            )
+            Subscription.objects.create(user=self.user, following=author)
+
+    def count_queries(self):
+        # Первый запрос прогревает кеши, считаем второй
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        return response, len(queries.captured_queries)
+
+    def test_query_count_does_not_depend_on_authors(self):
+        self.follow(1)
+        response, single = self.count_queries()
+        self.assertEqual(response.data["count"], 1)
+
+        self.follow(19)
+        self.client.get(self.url)
+        with self.assertNumQueries(single):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["count"], 20)
+        for author in response.data["results"]:
+            self.assertEqual(len(author["recipes"]), 2)
+
+
+class CountersTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        local_tokens.items.clear()
+        self.user = create_user("author")
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def add_follower_and_recipe(self):
+        Subscription.objects.create(
+            user=create_user("follower"), following=self.user)
+        Recipe.objects.create(author=self.user, name="recipe", text="text",
+                              cooking_time=5, image="recipes/image.png")
+
+    def assert_counters(self, recipes, followers):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.recipes_count, recipes)
+        self.assertEqual(self.user.followers_count, followers)
+
+    def test_write_after_cached_read_keeps_counters(self):
+        # GET кладёт пользователя в кеш токенов со старыми счётчиками
+        self.client.get("/api/users/me/")
+        self.add_follower_and_recipe()
+        response = self.client.post("/api/users/set_password/", {
+            "current_password": "secret-password",
+            "new_password": "another-secret-password",
+        })
+        self.assertEqual(response.status_code, 204)
+        self.assert_counters(1, 1)
+
+    def test_stale_save_keeps_counters(self):
+        stale = User.objects.get(pk=self.user.pk)
+        self.add_follower_and_recipe()
+        stale.first_name = "renamed"
+        stale.save()
+        self.assert_counters(1, 1)
+        self.assertEqual(self.user.first_name, "renamed")
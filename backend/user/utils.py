@@ -0,0 +1,31 @@
+from django.db import connection
+from django.db.models import F
+
+from .models import Subscription, User
+
+
+def get_following_ids(request):
+    """id авторов, на которых подписан пользователь, один раз на запрос"""
+    following_ids = getattr(request, "_following_ids", None)
+    if following_ids is None:
+        following_ids = set(
+            Subscription.objects.filter(user=request.user)
+            .values_list("following_id", flat=True)
+        )
+        request._following_ids = following_ids
+    return following_ids
+
+
+def lock_users(user_ids):
+    """Блокирует строки пользователей до конца транзакции.
+
+    Изменения списков одного пользователя выстраиваются в очередь.
+    В SQLite нет FOR UPDATE: пустое обновление сразу берёт блокировку
+    на запись, поэтому вызывать до первых чтений транзакции.
+    """
+    users = User.objects.filter(pk__in=user_ids)
+    if connection.features.has_select_for_update:
+        list(users.select_for_update().order_by("pk").values_list(
+            "pk", flat=True))
+    else:
+        users.update(last_login=F("last_login"))
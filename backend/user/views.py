@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.db.models import OuterRef, Prefetch, Subquery
 from django.shortcuts import get_object_or_404
 from rest_framework import (
     permissions,
@@ -15,6 +16,8 @@ from .serializers import (
     CustomUserSerializer,
 )
 from djoser.views import UserViewSet
+from backend.middleware import TimedSerializerMixin
+from recipes.models import Recipe
 
 User = get_user_model()
 
@@ -32,16 +35,29 @@ class UserViewCustom(UserViewSet):
         )
 
 
-class SubscribeView(generics.ListAPIView):
+class SubscribeView(TimedSerializerMixin, generics.ListAPIView):
     queryset = User.objects.all()
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = SubscriptionShowSerializers
 
+    def get_recipes_prefetch(self):
+        """Превью рецептов сразу для всех авторов страницы"""
+        recipes = Recipe.objects.all()
+        limit = self.request.query_params.get("recipes_limit")
+        if limit and limit.isdigit():
+            top_ids = Recipe.objects.filter(
+                author_id=OuterRef("author_id"),
+            ).values("id")[:int(limit)]
+            recipes = recipes.filter(id__in=Subquery(top_ids))
+        return Prefetch("recipes", queryset=recipes, to_attr="preview_recipes")
+
     def get_queryset(self):
         user = self.request.user
         return User.objects.filter(
             following__user=user,
-        )
+        ).prefetch_related(
+            self.get_recipes_prefetch(),
+        ).order_by("id")
 
 
 class UserSubscribeView(APIView):